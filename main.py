@@ -1,4 +1,5 @@
 """Application launcher script"""
+import sys
 import uvicorn
 from src.core.config import config
 
@@ -7,6 +8,10 @@ if __name__ == "__main__":
         "src.main:app",
         host=config.server_host,
         port=config.server_port,
+        # uvicorn[standard] 提供 uvloop/httptools（uvloop 不支持 Windows）
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        timeout_keep_alive=config.server_timeout_keep_alive,
         reload=False
     )
 
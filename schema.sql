@@ -162,6 +162,8 @@ CREATE INDEX IF NOT EXISTS idx_task_id ON tasks(task_id);
 CREATE INDEX IF NOT EXISTS idx_task_status ON tasks(status);
 CREATE INDEX IF NOT EXISTS idx_token_active ON tokens(is_active);
 CREATE INDEX IF NOT EXISTS idx_token_email ON tokens(email);
+-- Partial index for get_active_tokens (matches its WHERE is_active and ORDER BY last_used_at)
+CREATE INDEX IF NOT EXISTS idx_tokens_active ON tokens(last_used_at NULLS FIRST) WHERE is_active = TRUE;
 CREATE INDEX IF NOT EXISTS idx_token_stats_token_id ON token_stats(token_id);
 CREATE INDEX IF NOT EXISTS idx_request_logs_token_id ON request_logs(token_id);
 CREATE INDEX IF NOT EXISTS idx_request_logs_created_at ON request_logs(created_at);
@@ -2,6 +2,7 @@
 from fastapi import APIRouter, HTTPException, Depends, Header
 from fastapi.responses import FileResponse
 from typing import List, Optional
+from dataclasses import replace
 from datetime import datetime
 from pathlib import Path
 import secrets
@@ -175,10 +176,11 @@ async def logout(token: str = Depends(verify_admin_token)):
 async def get_tokens(token: str = Depends(verify_admin_token)) -> List[dict]:
     """Get all tokens with statistics"""
     tokens = await token_manager.get_all_tokens()
+    all_stats = await db.get_token_stats_by_ids([token.id for token in tokens])
     result = []
 
     for token in tokens:
-        stats = await db.get_token_stats(token.id)
+        stats = all_stats.get(token.id)
         result.append({
             "id": token.id,
             "token": token.token,  # 完整的Access Token
@@ -557,7 +559,7 @@ async def update_admin_config(
         current_config = await db.get_admin_config()
 
         # Update only the error_ban_threshold, preserve username and password
-        current_config.error_ban_threshold = request.error_ban_threshold
+        current_config = replace(current_config, error_ban_threshold=request.error_ban_threshold)
 
         await db.update_admin_config(current_config)
         return {"success": True, "message": "Configuration updated"}
@@ -579,11 +581,11 @@ async def update_admin_password(
         admin_config = await db.get_admin_config()
 
         # Update password in database
-        admin_config.admin_password = request.new_password
+        admin_config = replace(admin_config, admin_password=request.new_password)
 
         # Update username if provided
         if request.username:
-            admin_config.admin_username = request.username
+            admin_config = replace(admin_config, admin_username=request.username)
 
         # Update in database
         await db.update_admin_config(admin_config)
@@ -613,7 +615,7 @@ async def update_api_key(
         admin_config = await db.get_admin_config()
 
         # Update api_key in database
-        admin_config.api_key = request.new_api_key
+        admin_config = replace(admin_config, api_key=request.new_api_key)
         await db.update_admin_config(admin_config)
 
         # Update in-memory config
@@ -708,8 +710,9 @@ async def get_stats(token: str = Depends(verify_admin_token)):
     today_videos = 0
     today_errors = 0
 
+    all_stats = await db.get_token_stats_by_ids([token.id for token in tokens])
     for token in tokens:
-        stats = await db.get_token_stats(token.id)
+        stats = all_stats.get(token.id)
         if stats:
             total_images += stats.image_count
             total_videos += stats.video_count
@@ -1,11 +1,12 @@
 """API routes - OpenAI compatible endpoints"""
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import Response, StreamingResponse, ORJSONResponse
+from collections import OrderedDict
 from datetime import datetime
-from typing import List
-import json
+from types import MappingProxyType
+from typing import AsyncIterator, List, Tuple
+import orjson
 import re
-import traceback
 from ..core.auth import verify_api_key_header
 from ..core.logger import debug_logger
 from ..core.models import (
@@ -22,7 +23,44 @@ from ..core.models import (
 )
 from ..services.generation_handler import GenerationHandler, MODEL_CONFIG
 
-router = APIRouter()
+# 默认使用 orjson 编码路由返回的 dict，避免标准库 json 的开销
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Sora share link video ID: s_[a-f0-9]{32}
+_REMIX_ID_RE = re.compile(r's_[a-f0-9]{32}')
+
+# Prefixes checked in a single startswith() call
+_VIDEO_DATA_URI_PREFIXES = ("data:video", "data:application")
+# "base64," is searched only within the data URI header, not the payload
+_DATA_URI_HEADER_MAX = 256
+
+# MODEL_CONFIG is static, so the /v1/models payload is built once at import
+_MODELS_RESPONSE = {
+    "object": "list",
+    "data": [{"id": model_id, "object": "model"} for model_id in MODEL_CONFIG]
+}
+
+# Model ids grouped by type, so endpoints validate with a single set lookup
+_IMAGE_MODELS = frozenset(k for k, v in MODEL_CONFIG.items() if v["type"] == "image")
+_VIDEO_MODELS = frozenset(k for k, v in MODEL_CONFIG.items() if v["type"] == "video")
+
+# 角色创建使用默认的视频模型配置
+_CHARACTER_MODEL_CONFIG = MODEL_CONFIG["sora2-landscape-10s"]
+
+# Shared headers for SSE streaming responses (read-only, reused by every request)
+_SSE_HEADERS = MappingProxyType({
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"
+})
+
+# Pre-encoded SSE stream terminator
+_SSE_DONE = b'data: [DONE]\n\n'
+
+# Serialized status responses of finished tasks, keyed by task_id -> ((status, completed_at), body)
+_TERMINAL_TASK_STATUSES = frozenset(("completed", "failed"))
+_TASK_RESPONSE_CACHE_SIZE = 10000
+_task_response_cache: "OrderedDict[str, Tuple[tuple, bytes]]" = OrderedDict()
 
 # Dependency injection will be set up in main.py
 generation_handler: GenerationHandler = None
@@ -33,15 +71,29 @@ def set_generation_handler(handler: GenerationHandler):
     generation_handler = handler
 
 def _log_exception(endpoint: str, exception: Exception):
-    """Log exception with full traceback"""
-    error_traceback = traceback.format_exc()
+    """Log exception with full traceback (formatted lazily by the logger)"""
     debug_logger.log_api_error(
         path=endpoint,
         error_message=str(exception),
         status_code=500,
-        traceback_str=error_traceback
+        exc_info=exception
     )
 
+def _raise_model_type_error(model: str, expected_type: str):
+    """Raise the 400 for a model that is unknown or of the wrong type"""
+    if model not in MODEL_CONFIG:
+        raise HTTPException(status_code=400, detail=f"Invalid model: {model}")
+    article = "an" if expected_type == "image" else "a"
+    raise HTTPException(status_code=400, detail=f"Model {model} is not {article} {expected_type} model")
+
+def _strip_video_data_uri(video_data: str) -> str:
+    """Strip a base64 video data URI prefix; URLs and raw base64 pass through"""
+    if video_data.startswith(_VIDEO_DATA_URI_PREFIXES):
+        idx = video_data.find("base64,", 0, _DATA_URI_HEADER_MAX)
+        if idx != -1:
+            return video_data[idx + 7:]
+    return video_data
+
 def _extract_remix_id(text: str) -> str:
     """Extract remix ID from text
 
@@ -55,31 +107,155 @@ def _extract_remix_id(text: str) -> str:
     Returns:
         Remix ID (s_[a-f0-9]{32}) or empty string if not found
     """
-    if not text:
+    if not text or "s_" not in text:
         return ""
 
     # Match Sora share link format: s_[a-f0-9]{32}
-    match = re.search(r's_[a-f0-9]{32}', text)
+    match = _REMIX_ID_RE.search(text)
     if match:
         return match.group(0)
 
     return ""
 
+def _parse_text_part(item: dict, parts: dict):
+    """Handle a multimodal "text" content part"""
+    prompt = item.get("text", "")
+    parts["prompt"] = prompt
+    # Extract remix_target_id from prompt if not already provided
+    if not parts["remix_target_id"]:
+        parts["remix_target_id"] = _extract_remix_id(prompt)
+
+def _parse_image_url_part(item: dict, parts: dict):
+    """Handle a multimodal "image_url" content part"""
+    url = item.get("image_url", {}).get("url", "")
+    if url.startswith("data:image"):
+        # Pass the data URI as-is; the prefix is stripped right before upload
+        parts["image"] = url
+
+def _parse_video_url_part(item: dict, parts: dict):
+    """Handle a multimodal "video_url" content part"""
+    # Pass data URIs and plain URLs as-is (decoded or downloaded in generation_handler)
+    parts["video"] = item.get("video_url", {}).get("url", "")
+
+# Content part type -> handler, one dict lookup per part
+_CONTENT_PART_HANDLERS = {
+    "text": _parse_text_part,
+    "image_url": _parse_image_url_part,
+    "video_url": _parse_video_url_part
+}
+
+def _exception_message(exc: Exception) -> str:
+    """Equivalent of str(exc), reading args[0] directly for plain single-message exceptions"""
+    args = exc.args
+    if len(args) == 1 and type(args[0]) is str and type(exc).__str__ is BaseException.__str__:
+        return args[0]
+    return str(exc)
+
+# server_error body template; only the message varies
+_ERROR_BODY_PREFIX = b'{"error":{"message":'
+_ERROR_BODY_SUFFIX = b',"type":"server_error","param":null,"code":null}}'
+
+def _error_body(message: str) -> bytes:
+    """Encode an OpenAI-compatible server_error body"""
+    return _ERROR_BODY_PREFIX + orjson.dumps(message) + _ERROR_BODY_SUFFIX
+
+def _sse_error_frame(message: str) -> bytes:
+    """Encode a server_error body as an SSE data frame"""
+    return b'data: ' + _ERROR_BODY_PREFIX + orjson.dumps(message) + _ERROR_BODY_SUFFIX + b'\n\n'
+
+# Bodies of the common failure responses, encoded once at import
+_COMMON_ERROR_BODIES = {
+    message: _error_body(message)
+    for message in ("Generation failed", "Availability check failed")
+}
+
+def _requires_stream_body(message: str) -> bytes:
+    """Encode the invalid_request_error body for endpoints that only support stream=true"""
+    return orjson.dumps({
+        "error": {
+            "message": message,
+            "type": "invalid_request_error",
+            "param": "stream",
+            "code": None
+        }
+    })
+
+_CHARACTER_CREATE_REQUIRES_STREAM_BODY = _requires_stream_body(
+    "Character creation requires streaming mode. Please set stream=true"
+)
+_CHARACTER_GENERATE_REQUIRES_STREAM_BODY = _requires_stream_body(
+    "Character video generation requires streaming mode. Please set stream=true"
+)
+
+def _error_response(message: str, status_code: int = 500) -> Response:
+    """Build an OpenAI-compatible server_error response"""
+    body = _COMMON_ERROR_BODIES.get(message)
+    if body is None:
+        body = _error_body(message)
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+async def _sse_stream(chunks: AsyncIterator[bytes]):
+    """Relay SSE chunks, converting failures into an SSE error frame
+
+    Chunks arrive already encoded as bytes, so they are passed through untouched.
+    They are not coalesced: progress frames are emitted once per upstream poll
+    (seconds apart), so buffering would only delay them without saving sends.
+    """
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except Exception as e:
+        message = _exception_message(e)
+        # Try to parse structured error (JSON format)
+        error_data = None
+        try:
+            error_data = orjson.loads(message)
+        except orjson.JSONDecodeError:
+            pass
+
+        # Return OpenAI-compatible error format
+        if error_data and isinstance(error_data, dict) and "error" in error_data:
+            # Structured error (e.g., unsupported_country_code)
+            yield b'data: ' + orjson.dumps(error_data) + b'\n\n'
+        else:
+            # Generic error
+            yield _sse_error_frame(message)
+        yield _SSE_DONE
+
+def _sse_response(chunks: AsyncIterator[bytes]) -> StreamingResponse:
+    """Build the SSE response shared by all streaming endpoints"""
+    return StreamingResponse(
+        _sse_stream(chunks),
+        media_type="text/event-stream",
+        headers=_SSE_HEADERS
+    )
+
+def _stream_generation(model: str, prompt: str, image=None, video=None,
+                       remix_target_id=None) -> StreamingResponse:
+    """Build the SSE response for a generation request"""
+    return _sse_response(generation_handler.handle_generation(
+        model=model,
+        prompt=prompt,
+        image=image,
+        video=video,
+        remix_target_id=remix_target_id,
+        stream=True
+    ))
+
+def _task_submitted_response(task_id: str, task_type: str) -> Response:
+    """Build the async-mode submission response"""
+    body = orjson.dumps({
+        "task_id": task_id,
+        "task_type": task_type,
+        "status": "processing",
+        "message": "Task submitted successfully. Use GET /v1/tasks/{task_id} to check status."
+    })
+    return Response(content=body, media_type="application/json")
+
 @router.get("/v1/models")
 async def list_models(api_key: str = Depends(verify_api_key_header)):
     """List available models"""
-    models = []
-    
-    for model_id, config in MODEL_CONFIG.items():
-        models.append({
-            "id": model_id,
-            "object": "model"
-        })
-    
-    return {
-        "object": "list",
-        "data": models
-    }
+    return _MODELS_RESPONSE
 
 @router.get("/v1/tasks/{task_id}", response_model=TaskStatusResponse)
 async def get_task_status(
@@ -103,40 +279,39 @@ async def get_task_status(
         if not task:
             raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
         
-        # 解析 result_urls
-        result_urls = None
-        if task.result_urls:
-            try:
-                parsed_result = json.loads(task.result_urls)
-                # Check if this is a character creation task (returns dict instead of list)
-                if task.model == "character-creation":
-                    # For character creation, result_urls is a dict with character info
-                    # TaskStatusResponse now supports Union[List[str], Dict]
-                    if isinstance(parsed_result, dict):
-                        result_urls = parsed_result  # Keep as dict
-                    else:
-                        result_urls = parsed_result if isinstance(parsed_result, list) else [parsed_result]
-                else:
-                    # For other task types (image/video), result_urls should be a list
-                    result_urls = parsed_result if isinstance(parsed_result, list) else [parsed_result]
-            except:
-                result_urls = [task.result_urls] if task.result_urls else None
+        # 已结束的任务不会再变化，直接返回缓存的响应
+        signature = (task.status, task.completed_at)
+        cached = _task_response_cache.get(task_id)
+        if cached is not None and cached[0] == signature:
+            _task_response_cache.move_to_end(task_id)
+            return Response(content=cached[1], media_type="application/json")
         
-        return TaskStatusResponse(
+        # 与 response_model 一致：构造时校验一次（result_urls 已由数据库层解码为列表或角色信息字典），
+        # 再用 orjson 编码；路由直接返回 bytes，FastAPI 不会再按 response_model 校验
+        response = TaskStatusResponse(
             task_id=task.task_id,
             status=task.status,
             progress=task.progress,
             model=task.model,
             prompt=task.prompt,
-            result_urls=result_urls,
+            result_urls=task.result_urls,
             error_message=task.error_message,
             created_at=task.created_at.isoformat() if task.created_at else None,
             completed_at=task.completed_at.isoformat() if task.completed_at else None
         )
+        body = orjson.dumps(response.model_dump())
+        
+        if task.status in _TERMINAL_TASK_STATUSES:
+            _task_response_cache[task_id] = (signature, body)
+            _task_response_cache.move_to_end(task_id)
+            if len(_task_response_cache) > _TASK_RESPONSE_CACHE_SIZE:
+                _task_response_cache.popitem(last=False)
+        
+        return Response(content=body, media_type="application/json")
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=_exception_message(e))
 
 @router.post("/v1/chat/completions")
 async def create_chat_completion(
@@ -170,167 +345,58 @@ async def create_chat_completion(
                 remix_target_id = _extract_remix_id(prompt)
         elif isinstance(content, list):
             # Array format (OpenAI multimodal)
+            parts = {
+                "prompt": prompt,
+                "image": image_data,
+                "video": video_data,
+                "remix_target_id": remix_target_id
+            }
             for item in content:
                 if isinstance(item, dict):
-                    if item.get("type") == "text":
-                        prompt = item.get("text", "")
-                        # Extract remix_target_id from prompt if not already provided
-                        if not remix_target_id:
-                            remix_target_id = _extract_remix_id(prompt)
-                    elif item.get("type") == "image_url":
-                        # Extract base64 image from data URI
-                        image_url = item.get("image_url", {})
-                        url = image_url.get("url", "")
-                        if url.startswith("data:image"):
-                            # Extract base64 data from data URI
-                            if "base64," in url:
-                                image_data = url.split("base64,", 1)[1]
-                            else:
-                                image_data = url
-                    elif item.get("type") == "video_url":
-                        # Extract video from video_url
-                        video_url = item.get("video_url", {})
-                        url = video_url.get("url", "")
-                        if url.startswith("data:video") or url.startswith("data:application"):
-                            # Extract base64 data from data URI
-                            if "base64," in url:
-                                video_data = url.split("base64,", 1)[1]
-                            else:
-                                video_data = url
-                        else:
-                            # It's a URL, pass it as-is (will be downloaded in generation_handler)
-                            video_data = url
+                    handler = _CONTENT_PART_HANDLERS.get(item.get("type"))
+                    if handler is not None:
+                        handler(item, parts)
+            prompt = parts["prompt"]
+            image_data = parts["image"]
+            video_data = parts["video"]
+            remix_target_id = parts["remix_target_id"]
         else:
             raise HTTPException(status_code=400, detail="Invalid content format")
 
         # Validate model
+        # 模型校验保留在路由层：请求模型里改成 Literal 会让非法模型返回 422 而不是 400，
+        # 且 core.models 无法引用 services 中的 MODEL_CONFIG（循环导入）；单次哈希查找已足够
         if request.model not in MODEL_CONFIG:
             raise HTTPException(status_code=400, detail=f"Invalid model: {request.model}")
 
-        # Check if this is a video model
-        model_config = MODEL_CONFIG[request.model]
-        is_video_model = model_config["type"] == "video"
-
-        # For video models with video parameter, we need streaming
-        if is_video_model and (video_data or remix_target_id):
-            if not request.stream:
-                # Non-streaming mode: only check availability
-                result = None
-                async for chunk in generation_handler.handle_generation(
-                    model=request.model,
-                    prompt=prompt,
-                    image=image_data,
-                    video=video_data,
-                    remix_target_id=remix_target_id,
-                    stream=False
-                ):
-                    result = chunk
-
-                if result:
-                    return JSONResponse(content=json.loads(result))
-                else:
-                    return JSONResponse(
-                        status_code=500,
-                        content={
-                            "error": {
-                                "message": "Availability check failed",
-                                "type": "server_error",
-                                "param": None,
-                                "code": None
-                            }
-                        }
-                    )
-
         # Handle streaming
         if request.stream:
-            async def generate():
-                try:
-                    async for chunk in generation_handler.handle_generation(
-                        model=request.model,
-                        prompt=prompt,
-                        image=image_data,
-                        video=video_data,
-                        remix_target_id=remix_target_id,
-                        stream=True
-                    ):
-                        yield chunk
-                except Exception as e:
-                    # Try to parse structured error (JSON format)
-                    error_data = None
-                    try:
-                        error_data = json.loads(str(e))
-                    except:
-                        pass
-
-                    # Return OpenAI-compatible error format
-                    if error_data and isinstance(error_data, dict) and "error" in error_data:
-                        # Structured error (e.g., unsupported_country_code)
-                        error_response = error_data
-                    else:
-                        # Generic error
-                        error_response = {
-                            "error": {
-                                "message": str(e),
-                                "type": "server_error",
-                                "param": None,
-                                "code": None
-                            }
-                        }
-                    error_chunk = f'data: {json.dumps(error_response)}\n\n'
-                    yield error_chunk
-                    yield 'data: [DONE]\n\n'
-
-            return StreamingResponse(
-                generate(),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "X-Accel-Buffering": "no"
-                }
+            return _stream_generation(
+                model=request.model,
+                prompt=prompt,
+                image=image_data,
+                video=video_data,
+                remix_target_id=remix_target_id
             )
         else:
             # Non-streaming response (availability check only)
-            result = None
-            async for chunk in generation_handler.handle_generation(
+            result = await generation_handler.handle_single(
                 model=request.model,
                 prompt=prompt,
                 image=image_data,
                 video=video_data,
-                remix_target_id=remix_target_id,
-                stream=False
-            ):
-                result = chunk
+                remix_target_id=remix_target_id
+            )
 
             if result:
-                return JSONResponse(content=json.loads(result))
+                return Response(content=result, media_type="application/json")
             else:
                 # Return OpenAI-compatible error format
-                return JSONResponse(
-                    status_code=500,
-                    content={
-                        "error": {
-                            "message": "Availability check failed",
-                            "type": "server_error",
-                            "param": None,
-                            "code": None
-                        }
-                    }
-                )
+                return _error_response("Availability check failed")
 
     except Exception as e:
         # Return OpenAI-compatible error format
-        return JSONResponse(
-            status_code=500,
-            content={
-                "error": {
-                    "message": str(e),
-                    "type": "server_error",
-                    "param": None,
-                    "code": None
-                }
-            }
-        )
+        return _error_response(_exception_message(e))
 
 # ==================== 独立功能 API 端点 ====================
 
@@ -340,19 +406,15 @@ async def generate_image(
     api_key: str = Depends(verify_api_key_header)
 ):
     """文生图 - 根据文本描述生成图片"""
+    # 检查 generation_handler 是否已初始化
+    if generation_handler is None:
+        raise HTTPException(status_code=500, detail="Generation handler not initialized")
+    
+    # 验证模型
+    if request.model not in _IMAGE_MODELS:
+        _raise_model_type_error(request.model, "image")
+    
     try:
-        # 检查 generation_handler 是否已初始化
-        if generation_handler is None:
-            raise HTTPException(status_code=500, detail="Generation handler not initialized")
-        
-        # 验证模型
-        if request.model not in MODEL_CONFIG:
-            raise HTTPException(status_code=400, detail=f"Invalid model: {request.model}")
-        
-        model_config = MODEL_CONFIG[request.model]
-        if model_config["type"] != "image":
-            raise HTTPException(status_code=400, detail=f"Model {request.model} is not an image model")
-        
         # 异步模式：立即返回 task_id
         if request.async_mode:
             task_id, task_type = await generation_handler.submit_generation_task(
@@ -362,89 +424,33 @@ async def generate_image(
                 video=None,
                 remix_target_id=None
             )
-            return JSONResponse(content={
-                "task_id": task_id,
-                "task_type": task_type,
-                "status": "processing",
-                "message": "Task submitted successfully. Use GET /v1/tasks/{task_id} to check status."
-            })
+            return _task_submitted_response(task_id, task_type)
         
         # 处理流式响应
         if request.stream:
-            async def generate():
-                try:
-                    async for chunk in generation_handler.handle_generation(
-                        model=request.model,
-                        prompt=request.prompt,
-                        image=None,
-                        video=None,
-                        remix_target_id=None,
-                        stream=True
-                    ):
-                        yield chunk
-                except Exception as e:
-                    error_response = {
-                        "error": {
-                            "message": str(e),
-                            "type": "server_error",
-                            "param": None,
-                            "code": None
-                        }
-                    }
-                    error_chunk = f'data: {json.dumps(error_response)}\n\n'
-                    yield error_chunk
-                    yield 'data: [DONE]\n\n'
-            
-            return StreamingResponse(
-                generate(),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "X-Accel-Buffering": "no"
-                }
+            return _stream_generation(
+                model=request.model,
+                prompt=request.prompt,
+                image=None,
+                video=None,
+                remix_target_id=None
             )
         else:
             # 非流式响应
-            result = None
-            async for chunk in generation_handler.handle_generation(
+            result = await generation_handler.handle_single(
                 model=request.model,
                 prompt=request.prompt,
                 image=None,
                 video=None,
-                remix_target_id=None,
-                stream=False
-            ):
-                result = chunk
+                remix_target_id=None
+            )
             
             if result:
-                return JSONResponse(content=json.loads(result))
+                return Response(content=result, media_type="application/json")
             else:
-                return JSONResponse(
-                    status_code=500,
-                    content={
-                        "error": {
-                            "message": "Generation failed",
-                            "type": "server_error",
-                            "param": None,
-                            "code": None
-                        }
-                    }
-                )
-    except HTTPException:
-        raise
+                return _error_response("Generation failed")
     except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "error": {
-                    "message": str(e),
-                    "type": "server_error",
-                    "param": None,
-                    "code": None
-                }
-            }
-        )
+        return _error_response(_exception_message(e))
 
 @router.post("/v1/images/transform")
 async def transform_image(
@@ -452,20 +458,13 @@ async def transform_image(
     api_key: str = Depends(verify_api_key_header)
 ):
     """图生图 - 基于上传的图片进行创意变换"""
+    # 验证模型
+    if request.model not in _IMAGE_MODELS:
+        _raise_model_type_error(request.model, "image")
+    
     try:
-        # 验证模型
-        if request.model not in MODEL_CONFIG:
-            raise HTTPException(status_code=400, detail=f"Invalid model: {request.model}")
-        
-        model_config = MODEL_CONFIG[request.model]
-        if model_config["type"] != "image":
-            raise HTTPException(status_code=400, detail=f"Model {request.model} is not an image model")
-        
-        # 提取 base64 图片数据
+        # base64 图片数据（data URI 前缀在上传前由 generation_handler 去除）
         image_data = request.image
-        if image_data.startswith("data:image"):
-            if "base64," in image_data:
-                image_data = image_data.split("base64,", 1)[1]
         
         # 异步模式：立即返回 task_id
         if request.async_mode:
@@ -476,89 +475,33 @@ async def transform_image(
                 video=None,
                 remix_target_id=None
             )
-            return JSONResponse(content={
-                "task_id": task_id,
-                "task_type": task_type,
-                "status": "processing",
-                "message": "Task submitted successfully. Use GET /v1/tasks/{task_id} to check status."
-            })
+            return _task_submitted_response(task_id, task_type)
         
         # 处理流式响应
         if request.stream:
-            async def generate():
-                try:
-                    async for chunk in generation_handler.handle_generation(
-                        model=request.model,
-                        prompt=request.prompt,
-                        image=image_data,
-                        video=None,
-                        remix_target_id=None,
-                        stream=True
-                    ):
-                        yield chunk
-                except Exception as e:
-                    error_response = {
-                        "error": {
-                            "message": str(e),
-                            "type": "server_error",
-                            "param": None,
-                            "code": None
-                        }
-                    }
-                    error_chunk = f'data: {json.dumps(error_response)}\n\n'
-                    yield error_chunk
-                    yield 'data: [DONE]\n\n'
-            
-            return StreamingResponse(
-                generate(),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "X-Accel-Buffering": "no"
-                }
+            return _stream_generation(
+                model=request.model,
+                prompt=request.prompt,
+                image=image_data,
+                video=None,
+                remix_target_id=None
             )
         else:
             # 非流式响应
-            result = None
-            async for chunk in generation_handler.handle_generation(
+            result = await generation_handler.handle_single(
                 model=request.model,
                 prompt=request.prompt,
                 image=image_data,
                 video=None,
-                remix_target_id=None,
-                stream=False
-            ):
-                result = chunk
+                remix_target_id=None
+            )
             
             if result:
-                return JSONResponse(content=json.loads(result))
+                return Response(content=result, media_type="application/json")
             else:
-                return JSONResponse(
-                    status_code=500,
-                    content={
-                        "error": {
-                            "message": "Generation failed",
-                            "type": "server_error",
-                            "param": None,
-                            "code": None
-                        }
-                    }
-                )
-    except HTTPException:
-        raise
+                return _error_response("Generation failed")
     except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "error": {
-                    "message": str(e),
-                    "type": "server_error",
-                    "param": None,
-                    "code": None
-                }
-            }
-        )
+        return _error_response(_exception_message(e))
 
 @router.post("/v1/videos/generate")
 async def generate_video(
@@ -566,23 +509,17 @@ async def generate_video(
     api_key: str = Depends(verify_api_key_header)
 ):
     """文生视频 - 根据文本描述生成视频"""
+    # 检查 generation_handler 是否已初始化
+    if generation_handler is None:
+        raise HTTPException(status_code=500, detail="Generation handler not initialized")
+    
+    # 验证模型
+    if request.model not in _VIDEO_MODELS:
+        _raise_model_type_error(request.model, "video")
+    
     try:
-        # 检查 generation_handler 是否已初始化
-        if generation_handler is None:
-            raise HTTPException(status_code=500, detail="Generation handler not initialized")
-        
-        # 验证模型
-        if request.model not in MODEL_CONFIG:
-            raise HTTPException(status_code=400, detail=f"Invalid model: {request.model}")
-        
-        model_config = MODEL_CONFIG[request.model]
-        if model_config["type"] != "video":
-            raise HTTPException(status_code=400, detail=f"Model {request.model} is not a video model")
-        
         # 处理风格
-        prompt = request.prompt
-        if request.style:
-            prompt = f"{{{request.style}}}{prompt}"
+        prompt = "{" + request.style + "}" + request.prompt if request.style else request.prompt
         
         # 异步模式：立即返回 task_id
         if request.async_mode:
@@ -593,91 +530,35 @@ async def generate_video(
                 video=None,
                 remix_target_id=None
             )
-            return JSONResponse(content={
-                "task_id": task_id,
-                "task_type": task_type,
-                "status": "processing",
-                "message": "Task submitted successfully. Use GET /v1/tasks/{task_id} to check status."
-            })
+            return _task_submitted_response(task_id, task_type)
         
         # 处理流式响应
         if request.stream:
-            async def generate():
-                try:
-                    async for chunk in generation_handler.handle_generation(
-                        model=request.model,
-                        prompt=prompt,
-                        image=None,
-                        video=None,
-                        remix_target_id=None,
-                        stream=True
-                    ):
-                        yield chunk
-                except Exception as e:
-                    error_response = {
-                        "error": {
-                            "message": str(e),
-                            "type": "server_error",
-                            "param": None,
-                            "code": None
-                        }
-                    }
-                    error_chunk = f'data: {json.dumps(error_response)}\n\n'
-                    yield error_chunk
-                    yield 'data: [DONE]\n\n'
-            
-            return StreamingResponse(
-                generate(),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "X-Accel-Buffering": "no"
-                }
+            return _stream_generation(
+                model=request.model,
+                prompt=prompt,
+                image=None,
+                video=None,
+                remix_target_id=None
             )
         else:
             # 非流式响应
-            result = None
-            async for chunk in generation_handler.handle_generation(
+            result = await generation_handler.handle_single(
                 model=request.model,
                 prompt=prompt,
                 image=None,
                 video=None,
-                remix_target_id=None,
-                stream=False
-            ):
-                result = chunk
+                remix_target_id=None
+            )
             
             if result:
-                return JSONResponse(content=json.loads(result))
+                return Response(content=result, media_type="application/json")
             else:
-                return JSONResponse(
-                    status_code=500,
-                    content={
-                        "error": {
-                            "message": "Generation failed",
-                            "type": "server_error",
-                            "param": None,
-                            "code": None
-                        }
-                    }
-                )
-    except HTTPException:
-        raise
+                return _error_response("Generation failed")
     except Exception as e:
         # Log the exception with full traceback
         _log_exception("/v1/videos/generate", e)
-        return JSONResponse(
-            status_code=500,
-            content={
-                "error": {
-                    "message": str(e),
-                    "type": "server_error",
-                    "param": None,
-                    "code": None
-                }
-            }
-        )
+        return _error_response(_exception_message(e))
 
 @router.post("/v1/videos/transform")
 async def transform_video(
@@ -685,25 +566,16 @@ async def transform_video(
     api_key: str = Depends(verify_api_key_header)
 ):
     """图生视频 - 基于图片生成相关视频"""
+    # 验证模型
+    if request.model not in _VIDEO_MODELS:
+        _raise_model_type_error(request.model, "video")
+    
     try:
-        # 验证模型
-        if request.model not in MODEL_CONFIG:
-            raise HTTPException(status_code=400, detail=f"Invalid model: {request.model}")
-        
-        model_config = MODEL_CONFIG[request.model]
-        if model_config["type"] != "video":
-            raise HTTPException(status_code=400, detail=f"Model {request.model} is not a video model")
-        
-        # 提取 base64 图片数据
+        # base64 图片数据（data URI 前缀在上传前由 generation_handler 去除）
         image_data = request.image
-        if image_data.startswith("data:image"):
-            if "base64," in image_data:
-                image_data = image_data.split("base64,", 1)[1]
         
         # 处理风格
-        prompt = request.prompt
-        if request.style:
-            prompt = f"{{{request.style}}}{prompt}"
+        prompt = "{" + request.style + "}" + request.prompt if request.style else request.prompt
         
         # 异步模式：立即返回 task_id
         if request.async_mode:
@@ -714,89 +586,33 @@ async def transform_video(
                 video=None,
                 remix_target_id=None
             )
-            return JSONResponse(content={
-                "task_id": task_id,
-                "task_type": task_type,
-                "status": "processing",
-                "message": "Task submitted successfully. Use GET /v1/tasks/{task_id} to check status."
-            })
+            return _task_submitted_response(task_id, task_type)
         
         # 处理流式响应
         if request.stream:
-            async def generate():
-                try:
-                    async for chunk in generation_handler.handle_generation(
-                        model=request.model,
-                        prompt=prompt,
-                        image=image_data,
-                        video=None,
-                        remix_target_id=None,
-                        stream=True
-                    ):
-                        yield chunk
-                except Exception as e:
-                    error_response = {
-                        "error": {
-                            "message": str(e),
-                            "type": "server_error",
-                            "param": None,
-                            "code": None
-                        }
-                    }
-                    error_chunk = f'data: {json.dumps(error_response)}\n\n'
-                    yield error_chunk
-                    yield 'data: [DONE]\n\n'
-            
-            return StreamingResponse(
-                generate(),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "X-Accel-Buffering": "no"
-                }
+            return _stream_generation(
+                model=request.model,
+                prompt=prompt,
+                image=image_data,
+                video=None,
+                remix_target_id=None
             )
         else:
             # 非流式响应
-            result = None
-            async for chunk in generation_handler.handle_generation(
+            result = await generation_handler.handle_single(
                 model=request.model,
                 prompt=prompt,
                 image=image_data,
                 video=None,
-                remix_target_id=None,
-                stream=False
-            ):
-                result = chunk
+                remix_target_id=None
+            )
             
             if result:
-                return JSONResponse(content=json.loads(result))
+                return Response(content=result, media_type="application/json")
             else:
-                return JSONResponse(
-                    status_code=500,
-                    content={
-                        "error": {
-                            "message": "Generation failed",
-                            "type": "server_error",
-                            "param": None,
-                            "code": None
-                        }
-                    }
-                )
-    except HTTPException:
-        raise
+                return _error_response("Generation failed")
     except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "error": {
-                    "message": str(e),
-                    "type": "server_error",
-                    "param": None,
-                    "code": None
-                }
-            }
-        )
+        return _error_response(_exception_message(e))
 
 @router.post("/v1/videos/remix")
 async def remix_video(
@@ -804,19 +620,13 @@ async def remix_video(
     api_key: str = Depends(verify_api_key_header)
 ):
     """Remix 视频 - 基于已有视频继续创作"""
+    # 验证模型
+    if request.model not in _VIDEO_MODELS:
+        _raise_model_type_error(request.model, "video")
+    
     try:
-        # 验证模型
-        if request.model not in MODEL_CONFIG:
-            raise HTTPException(status_code=400, detail=f"Invalid model: {request.model}")
-        
-        model_config = MODEL_CONFIG[request.model]
-        if model_config["type"] != "video":
-            raise HTTPException(status_code=400, detail=f"Model {request.model} is not a video model")
-        
         # 处理风格
-        prompt = request.prompt
-        if request.style:
-            prompt = f"{{{request.style}}}{prompt}"
+        prompt = "{" + request.style + "}" + request.prompt if request.style else request.prompt
         
         # 异步模式：立即返回 task_id
         if request.async_mode:
@@ -827,89 +637,33 @@ async def remix_video(
                 video=None,
                 remix_target_id=request.remix_target_id
             )
-            return JSONResponse(content={
-                "task_id": task_id,
-                "task_type": task_type,
-                "status": "processing",
-                "message": "Task submitted successfully. Use GET /v1/tasks/{task_id} to check status."
-            })
+            return _task_submitted_response(task_id, task_type)
         
         # 处理流式响应
         if request.stream:
-            async def generate():
-                try:
-                    async for chunk in generation_handler.handle_generation(
-                        model=request.model,
-                        prompt=prompt,
-                        image=None,
-                        video=None,
-                        remix_target_id=request.remix_target_id,
-                        stream=True
-                    ):
-                        yield chunk
-                except Exception as e:
-                    error_response = {
-                        "error": {
-                            "message": str(e),
-                            "type": "server_error",
-                            "param": None,
-                            "code": None
-                        }
-                    }
-                    error_chunk = f'data: {json.dumps(error_response)}\n\n'
-                    yield error_chunk
-                    yield 'data: [DONE]\n\n'
-            
-            return StreamingResponse(
-                generate(),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "X-Accel-Buffering": "no"
-                }
+            return _stream_generation(
+                model=request.model,
+                prompt=prompt,
+                image=None,
+                video=None,
+                remix_target_id=request.remix_target_id
             )
         else:
             # 非流式响应
-            result = None
-            async for chunk in generation_handler.handle_generation(
+            result = await generation_handler.handle_single(
                 model=request.model,
                 prompt=prompt,
                 image=None,
                 video=None,
-                remix_target_id=request.remix_target_id,
-                stream=False
-            ):
-                result = chunk
+                remix_target_id=request.remix_target_id
+            )
             
             if result:
-                return JSONResponse(content=json.loads(result))
+                return Response(content=result, media_type="application/json")
             else:
-                return JSONResponse(
-                    status_code=500,
-                    content={
-                        "error": {
-                            "message": "Generation failed",
-                            "type": "server_error",
-                            "param": None,
-                            "code": None
-                        }
-                    }
-                )
-    except HTTPException:
-        raise
+                return _error_response("Generation failed")
     except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "error": {
-                    "message": str(e),
-                    "type": "server_error",
-                    "param": None,
-                    "code": None
-                }
-            }
-        )
+        return _error_response(_exception_message(e))
 
 @router.post("/v1/videos/storyboard")
 async def storyboard_video(
@@ -917,19 +671,13 @@ async def storyboard_video(
     api_key: str = Depends(verify_api_key_header)
 ):
     """视频分镜 - 生成分镜视频"""
+    # 验证模型
+    if request.model not in _VIDEO_MODELS:
+        _raise_model_type_error(request.model, "video")
+    
     try:
-        # 验证模型
-        if request.model not in MODEL_CONFIG:
-            raise HTTPException(status_code=400, detail=f"Invalid model: {request.model}")
-        
-        model_config = MODEL_CONFIG[request.model]
-        if model_config["type"] != "video":
-            raise HTTPException(status_code=400, detail=f"Model {request.model} is not a video model")
-        
         # 处理风格
-        prompt = request.prompt
-        if request.style:
-            prompt = f"{{{request.style}}}{prompt}"
+        prompt = "{" + request.style + "}" + request.prompt if request.style else request.prompt
         
         # 异步模式：立即返回 task_id
         if request.async_mode:
@@ -940,89 +688,33 @@ async def storyboard_video(
                 video=None,
                 remix_target_id=None
             )
-            return JSONResponse(content={
-                "task_id": task_id,
-                "task_type": task_type,
-                "status": "processing",
-                "message": "Task submitted successfully. Use GET /v1/tasks/{task_id} to check status."
-            })
+            return _task_submitted_response(task_id, task_type)
         
         # 处理流式响应
         if request.stream:
-            async def generate():
-                try:
-                    async for chunk in generation_handler.handle_generation(
-                        model=request.model,
-                        prompt=prompt,
-                        image=None,
-                        video=None,
-                        remix_target_id=None,
-                        stream=True
-                    ):
-                        yield chunk
-                except Exception as e:
-                    error_response = {
-                        "error": {
-                            "message": str(e),
-                            "type": "server_error",
-                            "param": None,
-                            "code": None
-                        }
-                    }
-                    error_chunk = f'data: {json.dumps(error_response)}\n\n'
-                    yield error_chunk
-                    yield 'data: [DONE]\n\n'
-            
-            return StreamingResponse(
-                generate(),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "X-Accel-Buffering": "no"
-                }
+            return _stream_generation(
+                model=request.model,
+                prompt=prompt,
+                image=None,
+                video=None,
+                remix_target_id=None
             )
         else:
             # 非流式响应
-            result = None
-            async for chunk in generation_handler.handle_generation(
+            result = await generation_handler.handle_single(
                 model=request.model,
                 prompt=prompt,
                 image=None,
                 video=None,
-                remix_target_id=None,
-                stream=False
-            ):
-                result = chunk
+                remix_target_id=None
+            )
             
             if result:
-                return JSONResponse(content=json.loads(result))
+                return Response(content=result, media_type="application/json")
             else:
-                return JSONResponse(
-                    status_code=500,
-                    content={
-                        "error": {
-                            "message": "Generation failed",
-                            "type": "server_error",
-                            "param": None,
-                            "code": None
-                        }
-                    }
-                )
-    except HTTPException:
-        raise
+                return _error_response("Generation failed")
     except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "error": {
-                    "message": str(e),
-                    "type": "server_error",
-                    "param": None,
-                    "code": None
-                }
-            }
-        )
+        return _error_response(_exception_message(e))
 
 @router.post("/v1/characters/create")
 async def create_character(
@@ -1036,14 +728,7 @@ async def create_character(
     
     try:
         # 提取视频数据（支持 base64 或 URL）
-        video_data = request.video
-        if video_data.startswith("http://") or video_data.startswith("https://"):
-            # 这是 URL，直接传递
-            pass
-        elif video_data.startswith("data:video") or video_data.startswith("data:application"):
-            # 这是 base64 data URI，提取 base64 数据
-            if "base64," in video_data:
-                video_data = video_data.split("base64,", 1)[1]
+        video_data = _strip_video_data_uri(request.video)
         
         # 异步模式：立即返回 task_id
         if request.async_mode:
@@ -1051,103 +736,28 @@ async def create_character(
                 video_data=video_data,
                 timestamps=request.timestamps
             )
-            return JSONResponse(content={
-                "task_id": task_id,
-                "task_type": task_type,
-                "status": "processing",
-                "message": "Task submitted successfully. Use GET /v1/tasks/{task_id} to check status."
-            })
-        
-        # 使用默认的视频模型配置
-        model_config = MODEL_CONFIG["sora2-landscape-10s"]
+            return _task_submitted_response(task_id, task_type)
         
         # 处理流式响应
         if request.stream:
-            async def generate():
-                try:
-                    # 确保生成器立即开始产生数据
-                    async for chunk in generation_handler._handle_character_creation_only(
-                        video_data=video_data,
-                        model_config=model_config,
-                        timestamps=request.timestamps
-                    ):
-                        yield chunk
-                except Exception as e:
-                    # 确保错误也被正确发送
-                    error_response = {
-                        "error": {
-                            "message": str(e),
-                            "type": "server_error",
-                            "param": None,
-                            "code": None
-                        }
-                    }
-                    error_chunk = f'data: {json.dumps(error_response)}\n\n'
-                    yield error_chunk
-                    yield 'data: [DONE]\n\n'
-                finally:
-                    # 确保流式响应正确结束
-                    pass
-            
-            return StreamingResponse(
-                generate(),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "X-Accel-Buffering": "no"
-                }
-            )
+            return _sse_response(generation_handler._handle_character_creation_only(
+                video_data=video_data,
+                model_config=_CHARACTER_MODEL_CONFIG,
+                timestamps=request.timestamps
+            ))
         else:
             # 非流式响应不支持角色创建（因为需要流式输出角色名）
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "error": {
-                        "message": "Character creation requires streaming mode. Please set stream=true",
-                        "type": "invalid_request_error",
-                        "param": "stream",
-                        "code": None
-                    }
-                }
-            )
-    except HTTPException:
-        raise
+            return Response(content=_CHARACTER_CREATE_REQUIRES_STREAM_BODY, status_code=400, media_type="application/json")
     except Exception as e:
         # 如果是在流式响应之前出错，返回 JSON 响应
         if not request.stream:
-            return JSONResponse(
-                status_code=500,
-                content={
-                    "error": {
-                        "message": str(e),
-                        "type": "server_error",
-                        "param": None,
-                        "code": None
-                    }
-                }
-            )
-        # 如果是在流式响应中出错，需要通过生成器处理
-        async def error_generate():
-            error_response = {
-                "error": {
-                    "message": str(e),
-                    "type": "server_error",
-                    "param": None,
-                    "code": None
-                }
-            }
-            yield f'data: {json.dumps(error_response)}\n\n'
-            yield 'data: [DONE]\n\n'
-        
-        return StreamingResponse(
-            error_generate(),
+            return _error_response(_exception_message(e))
+        # 如果是在流式响应中出错，一次性返回完整的 SSE 错误帧
+        # （先编码为 bytes，不在闭包中持有异常及其 traceback）
+        return Response(
+            content=_sse_error_frame(_exception_message(e)) + _SSE_DONE,
             media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no"
-            }
+            headers=_SSE_HEADERS
         )
 
 @router.post("/v1/characters/generate")
@@ -1156,82 +766,25 @@ async def generate_character_video(
     api_key: str = Depends(verify_api_key_header)
 ):
     """角色生成视频 - 创建角色并使用角色生成视频"""
+    # 验证模型
+    if request.model not in _VIDEO_MODELS:
+        _raise_model_type_error(request.model, "video")
+    model_config = MODEL_CONFIG[request.model]
+    
     try:
-        # 验证模型
-        if request.model not in MODEL_CONFIG:
-            raise HTTPException(status_code=400, detail=f"Invalid model: {request.model}")
-        
-        model_config = MODEL_CONFIG[request.model]
-        if model_config["type"] != "video":
-            raise HTTPException(status_code=400, detail=f"Model {request.model} is not a video model")
-        
         # 提取视频数据（支持 base64 或 URL）
-        video_data = request.video
-        if video_data.startswith("http://") or video_data.startswith("https://"):
-            # 这是 URL，直接传递
-            pass
-        elif video_data.startswith("data:video") or video_data.startswith("data:application"):
-            # 这是 base64 data URI，提取 base64 数据
-            if "base64," in video_data:
-                video_data = video_data.split("base64,", 1)[1]
+        video_data = _strip_video_data_uri(request.video)
         
         # 处理流式响应
         if request.stream:
-            async def generate():
-                try:
-                    async for chunk in generation_handler._handle_character_and_video_generation(
-                        video_data=video_data,
-                        prompt=request.prompt,
-                        model_config=model_config,
-                        timestamps=request.timestamps
-                    ):
-                        yield chunk
-                except Exception as e:
-                    error_response = {
-                        "error": {
-                            "message": str(e),
-                            "type": "server_error",
-                            "param": None,
-                            "code": None
-                        }
-                    }
-                    error_chunk = f'data: {json.dumps(error_response)}\n\n'
-                    yield error_chunk
-                    yield 'data: [DONE]\n\n'
-            
-            return StreamingResponse(
-                generate(),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "X-Accel-Buffering": "no"
-                }
-            )
+            return _sse_response(generation_handler._handle_character_and_video_generation(
+                video_data=video_data,
+                prompt=request.prompt,
+                model_config=model_config,
+                timestamps=request.timestamps
+            ))
         else:
             # 非流式响应不支持角色生成视频（因为需要流式输出）
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "error": {
-                        "message": "Character video generation requires streaming mode. Please set stream=true",
-                        "type": "invalid_request_error",
-                        "param": "stream",
-                        "code": None
-                    }
-                }
-            )
-    except HTTPException:
-        raise
+            return Response(content=_CHARACTER_GENERATE_REQUIRES_STREAM_BODY, status_code=400, media_type="application/json")
     except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "error": {
-                    "message": str(e),
-                    "type": "server_error",
-                    "param": None,
-                    "code": None
-                }
-            }
-        )
+        return _error_response(_exception_message(e))
@@ -70,6 +70,10 @@ class Config:
     def server_port(self) -> int:
         return self._config["server"]["port"]
 
+    @property
+    def server_timeout_keep_alive(self) -> int:
+        return self._config["server"].get("timeout_keep_alive", 30)
+
     @property
     def debug_enabled(self) -> bool:
         return self._config.get("debug", {}).get("enabled", False)
@@ -1,14 +1,47 @@
 """Database storage layer"""
+import asyncio
 import asyncpg
-import json
+import orjson
+import time
 from datetime import datetime, date
-from typing import Optional, List
+from types import MappingProxyType
+from typing import Optional, List, Tuple, Dict, Any, Union, AsyncIterator, Mapping
 from urllib.parse import urlparse
 from .models import Token, TokenStats, Task, RequestLog, AdminConfig, ProxyConfig, WatermarkFreeConfig, CacheConfig, GenerationConfig, TokenRefreshConfig
 
 class Database:
     """PostgreSQL database manager"""
 
+    # 任务写入合批：窗口期内的 create_task 合并为一次 INSERT
+    _TASK_BATCH_WINDOW = 0.005  # seconds
+    _TASK_BATCH_MAX = 32
+    # 使用次数合并写入：间隔内的 update_token_usage 合并为一次 UPDATE
+    _USAGE_FLUSH_INTERVAL = 0.5  # seconds
+    # 请求日志合批：窗口期内的 log_request 通过 COPY 一次写入
+    _LOG_BATCH_WINDOW = 0.1  # seconds
+    _LOG_BATCH_MAX = 1000
+    _LOG_BUFFER_LIMIT = 10000
+    _LOG_ID_BLOCK = 100  # 每次从序列预取的日志 ID 数量
+    _LOG_COPY_MIN = 200  # 达到该行数才使用 COPY
+    _LOG_COLUMNS = ("id", "token_id", "task_id", "operation", "request_body", "response_body", "status_code", "duration", "updated_at")
+    _LOG_FIELD = {name: index for index, name in enumerate(_LOG_COLUMNS)}
+
+    # 显式列出模型字段对应的列（不用 SELECT *），读回的行可直接用 from_row 构造
+    _TOKEN_COLUMNS = Token.column_list()
+    _TASK_COLUMNS = Task.column_list()
+
+    _SESSION_CLEANUP_INTERVAL = 60  # seconds
+    _SESSION_CACHE_TTL = 5.0  # seconds
+    _SESSION_TOUCH_INTERVAL = 1.0  # seconds
+    # 配置读取缓存时间；多进程部署时其他 worker 的修改最多延迟这么久生效
+    _CONFIG_TTL = 30.0  # seconds
+    # 热点配置查询，新连接建立时预热
+    _CONFIG_SELECTS = tuple(
+        f"SELECT * FROM {table} WHERE id = 1"
+        for table in ("admin_config", "proxy_config", "watermark_free_config",
+                      "cache_config", "generation_config", "token_refresh_config")
+    )
+
     def __init__(self, db_url: str = None):
         import os
         if db_url is None:
@@ -17,6 +50,51 @@ class Database:
         
         self.db_url = db_url
         self.pool: Optional[asyncpg.Pool] = None
+        self._pool_lock = asyncio.Lock()
+        self._is_first_startup_cached: Optional[bool] = None
+        # 单行配置表缓存：table -> (读取时间, 行)；Record 不可变，每次返回新建的模型
+        self._config_cache: Dict[str, Tuple[float, Optional[object]]] = {}
+
+        # Connection pool tuning (overridable via environment variables)
+        # Rule of thumb: keep DB_POOL_MAX_SIZE x worker count near the server's
+        # (2 x CPU cores + effective spindles) and below its max_connections
+        self.pool_min_size = int(os.getenv("DB_POOL_MIN_SIZE", "10"))
+        self.pool_max_size = int(os.getenv("DB_POOL_MAX_SIZE", "50"))
+        self.pool_max_inactive_lifetime = float(os.getenv("DB_MAX_INACTIVE_LIFETIME", "300"))
+        self.pool_max_queries = int(os.getenv("DB_MAX_QUERIES", "50000"))
+        self.command_timeout = float(os.getenv("DB_COMMAND_TIMEOUT", "60"))
+        # Per-connection prepared statement LRU; sized above the number of distinct
+        # SQL texts used here so hot statements are never evicted and re-parsed
+        self.statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+        self._pending_tasks: List[Tuple[Task, asyncio.Future]] = []
+        self._task_batch_full = asyncio.Event()
+        self._task_flush: Optional[asyncio.Task] = None
+        self._usage_buffer: Dict[int, int] = {}
+        # 待写入的生成次数（token_id -> [图片数, 视频数]），与使用次数一起刷新
+        self._count_buffer: Dict[int, List[int]] = {}
+        self._usage_flush: Optional[asyncio.Task] = None
+        # 待写入的日志行（log_id -> 行），写入前的更新直接合并到行中
+        self._log_buffer: Dict[int, list] = {}
+        # 正在 COPY 的日志行；对它们的更新需等待写入完成
+        self._log_inflight: Dict[int, list] = {}
+        self._log_write_lock = asyncio.Lock()
+        # 当前这批正在写入的日志写完（无论成败）时置位
+        self._log_inflight_done: Optional[asyncio.Event] = None
+        self._log_batch_full = asyncio.Event()
+        self._log_flush: Optional[asyncio.Task] = None
+        self._session_cleanup_task: Optional[asyncio.Task] = None
+        # 由 check_and_migrate_db 检测；未检测前按无级联处理（显式删除统计行）
+        self._token_stats_cascade = False
+        # 管理员会话短期缓存（token -> (缓存时间, 会话)），省去登录后紧接着的鉴权查询
+        self._session_cache: Dict[str, Tuple[float, Mapping[str, Any]]] = {}
+        # 待更新 last_used_at 的会话 token，合并为一次批量 UPDATE
+        self._pending_touch: set = set()
+        self._touch_flush: Optional[asyncio.Task] = None
+        # 所有在运行的后台刷新任务（含已取出缓冲区、正在写入的），close 时等待它们完成
+        self._flush_tasks: set = set()
+        self._closing = False
+        self._log_ids: List[int] = []
+        self._log_ids_lock = asyncio.Lock()
 
     def _mask_password(self, url: str) -> str:
         """Mask password in database URL for logging"""
@@ -31,26 +109,83 @@ class Database:
     async def _get_pool(self) -> asyncpg.Pool:
         """Get or create database connection pool"""
         if self.pool is None:
-            self.pool = await asyncpg.create_pool(
-                self.db_url,
-                min_size=1,
-                max_size=10,
-                command_timeout=60
-            )
+            # Lock so concurrent first callers don't each create a pool
+            async with self._pool_lock:
+                if self.pool is None:
+                    self.pool = await asyncpg.create_pool(
+                        self.db_url,
+                        min_size=self.pool_min_size,
+                        max_size=self.pool_max_size,
+                        max_inactive_connection_lifetime=self.pool_max_inactive_lifetime,
+                        max_queries=self.pool_max_queries,
+                        statement_cache_size=self.statement_cache_size,
+                        command_timeout=self.command_timeout,
+                        # ISO 输出格式保证 date 文本解码为 YYYY-MM-DD（启动参数，RESET ALL 后仍生效）
+                        server_settings={"DateStyle": "ISO"},
+                        init=self._init_connection
+                    )
         return self.pool
 
+    @classmethod
+    async def _init_connection(cls, conn: asyncpg.Connection):
+        """Register per-connection type codecs and warm the statement cache"""
+        # DATE 列直接以 ISO 字符串返回，读取统计时无需在 Python 中转换
+        await conn.set_type_codec(
+            "date",
+            encoder=lambda value: value.isoformat() if isinstance(value, date) else value,
+            decoder=str,
+            schema="pg_catalog",
+            format="text"
+        )
+        # 预先执行配置查询，使其在新连接上已解析并进入语句缓存（SQL 文本须与 getter 完全一致）
+        for sql in cls._CONFIG_SELECTS:
+            try:
+                await conn.fetchrow(sql)
+            except asyncpg.PostgresError:
+                # 表尚未创建（首次部署前）时跳过
+                pass
+
+    def _start_flush(self, coro) -> asyncio.Task:
+        """Start a background flush task and track it until it finishes"""
+        task = asyncio.create_task(coro)
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+        return task
+
     async def close(self):
-        """Close database connection pool"""
+        """Drain pending background writes, then close the connection pool"""
+        # 停止调度新的刷新任务；仍在等待窗口的任务尚未取出缓冲区，可直接取消
+        self._closing = True
+        for task in (self._usage_flush, self._log_flush, self._touch_flush):
+            if task is not None:
+                task.cancel()
+        self._usage_flush = self._log_flush = self._touch_flush = None
+        # 排队中的任务调用方在等待写入结果，不能取消：结束批处理窗口让它立即写入
+        if self._task_flush is not None:
+            self._task_batch_full.set()
+        # 已开始写入的任务持有从缓冲区取出的数据，必须等它写完（失败时数据会放回缓冲区）
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
         if self.pool:
+            # 关闭前写入尚未落库的使用次数、生成计数、请求日志和会话使用时间
+            await self._write_token_usage()
+            await self._write_generation_counts()
+            await self._write_request_logs()
+            await self._write_session_touches()
+            if self._count_buffer:
+                print(f"⚠️ {len(self._count_buffer)} token(s) have generation counts that could not be written before shutdown")
             await self.pool.close()
             self.pool = None
+        self._closing = False
 
     async def _is_first_startup(self) -> bool:
         """Check if this is the first startup by checking if admin config exists"""
+        if self._is_first_startup_cached is not None:
+            return self._is_first_startup_cached
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            count = await conn.fetchval("SELECT COUNT(*) FROM admin_config")
-            return count == 0
+        has_config = await pool.fetchval("SELECT EXISTS (SELECT 1 FROM admin_config)")
+        self._is_first_startup_cached = not has_config
+        return self._is_first_startup_cached
 
     def db_exists(self) -> bool:
         """Check if database connection can be established"""
@@ -91,9 +226,9 @@ class Database:
             conn: Database connection
             config_dict: Configuration dictionary from setting.toml (optional)
         """
-        # Ensure admin_config has a row
-        count = await conn.fetchval("SELECT COUNT(*) FROM admin_config")
-        if count == 0:
+        # One transaction: a single BEGIN/COMMIT instead of autocommitting each statement
+        async with conn.transaction():
+            # Ensure admin_config has a row
             # Get admin credentials from config_dict if provided, otherwise use defaults
             admin_username = "admin"
             admin_password = "admin"
@@ -115,9 +250,7 @@ class Database:
                 ON CONFLICT (id) DO NOTHING
             """, admin_username, admin_password, api_key, error_ban_threshold)
 
-        # Ensure proxy_config has a row
-        count = await conn.fetchval("SELECT COUNT(*) FROM proxy_config")
-        if count == 0:
+            # Ensure proxy_config has a row
             # Get proxy config from config_dict if provided, otherwise use defaults
             proxy_enabled = False
             proxy_url = None
@@ -135,9 +268,7 @@ class Database:
                 ON CONFLICT (id) DO NOTHING
             """, proxy_enabled, proxy_url)
 
-        # Ensure watermark_free_config has a row
-        count = await conn.fetchval("SELECT COUNT(*) FROM watermark_free_config")
-        if count == 0:
+            # Ensure watermark_free_config has a row
             # Get watermark-free config from config_dict if provided, otherwise use defaults
             watermark_free_enabled = False
             parse_method = "third_party"
@@ -161,9 +292,7 @@ class Database:
                 ON CONFLICT (id) DO NOTHING
             """, watermark_free_enabled, parse_method, custom_parse_url, custom_parse_token)
 
-        # Ensure cache_config has a row
-        count = await conn.fetchval("SELECT COUNT(*) FROM cache_config")
-        if count == 0:
+            # Ensure cache_config has a row
             # Get cache config from config_dict if provided, otherwise use defaults
             cache_enabled = False
             cache_timeout = 600
@@ -183,9 +312,7 @@ class Database:
                 ON CONFLICT (id) DO NOTHING
             """, cache_enabled, cache_timeout, cache_base_url)
 
-        # Ensure generation_config has a row
-        count = await conn.fetchval("SELECT COUNT(*) FROM generation_config")
-        if count == 0:
+            # Ensure generation_config has a row
             # Get generation config from config_dict if provided, otherwise use defaults
             image_timeout = 300
             video_timeout = 3000
@@ -201,9 +328,7 @@ class Database:
                 ON CONFLICT (id) DO NOTHING
             """, image_timeout, video_timeout)
 
-        # Ensure token_refresh_config has a row
-        count = await conn.fetchval("SELECT COUNT(*) FROM token_refresh_config")
-        if count == 0:
+            # Ensure token_refresh_config has a row
             # Get token refresh config from config_dict if provided, otherwise use defaults
             at_auto_refresh_enabled = False
 
@@ -217,6 +342,10 @@ class Database:
                 ON CONFLICT (id) DO NOTHING
             """, at_auto_refresh_enabled)
 
+        # admin_config 行此时必然存在
+        self._is_first_startup_cached = False
+        self._config_cache.clear()
+
     async def check_and_migrate_db(self, config_dict: dict = None):
         """Check database integrity and perform migrations if needed
 
@@ -229,6 +358,49 @@ class Database:
             # Ensure all config tables have their default rows
             # Pass config_dict if available to initialize from setting.toml
             await self._ensure_config_rows(conn, config_dict)
+            # Detect whether token_stats cascades on token deletion (decides how delete_token works)
+            await self._check_token_stats_cascade(conn)
+            # Ensure indexes added after the initial schema exist
+            await self._ensure_indexes(conn)
+
+    async def _check_token_stats_cascade(self, conn):
+        """Detect whether token_stats.token_id cascades on token deletion (read-only)
+
+        Databases created from an older schema.sql may lack ON DELETE CASCADE.
+        Fixing that drops constraints and orphan rows, so it is left to the
+        operator; delete_token falls back to deleting the stats row itself.
+        """
+        self._token_stats_cascade = await conn.fetchval("""
+            SELECT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE conrelid = 'token_stats'::regclass
+                AND contype = 'f'
+                AND confrelid = 'tokens'::regclass
+                AND confdeltype = 'c'
+            )
+        """)
+        if not self._token_stats_cascade:
+            print("⚠️ token_stats.token_id has no ON DELETE CASCADE (older schema); "
+                  "see schema.sql for the current foreign key definition")
+
+    async def _ensure_indexes(self, conn):
+        """Create indexes missing from databases built with an older schema.sql"""
+        # CREATE INDEX CONCURRENTLY 中断会留下 INVALID 索引，IF NOT EXISTS 会一直跳过它，需先删除重建
+        is_valid = await conn.fetchval("""
+            SELECT i.indisvalid FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = 'idx_tokens_active'
+        """)
+        if is_valid:
+            return
+        if is_valid is False:
+            print("⚠️ idx_tokens_active is INVALID (interrupted build), rebuilding")
+            await conn.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_tokens_active")
+        # CONCURRENTLY 不锁表写入（不能在事务中执行）
+        await conn.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tokens_active
+            ON tokens(last_used_at NULLS FIRST) WHERE is_active = TRUE
+        """)
 
     async def init_db(self):
         """Initialize database tables - creates all tables and ensures data integrity"""
@@ -257,153 +429,197 @@ class Database:
                 await self._ensure_config_rows(conn, config_dict=None)
 
     # Token operations
-    async def add_token(self, token: Token) -> int:
-        """Add a new token"""
+    async def add_token(self, token: Token) -> Token:
+        """Add a new token and return the stored row"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            async with conn.transaction():
-                token_id = await conn.fetchval("""
-                    INSERT INTO tokens (token, email, username, name, st, rt, client_id, proxy_url, remark, expiry_time, is_active,
-                                       plan_type, plan_title, subscription_end, sora2_supported, sora2_invite_code,
-                                       sora2_redeemed_count, sora2_total_count, sora2_remaining_count, sora2_cooldown_until,
-                                       image_enabled, video_enabled, image_concurrency, video_concurrency)
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18, $19, $20, $21, $22, $23, $24)
-                    RETURNING id
-                """, token.token, token.email, "", token.name, token.st, token.rt, token.client_id, token.proxy_url,
-                      token.remark, token.expiry_time, token.is_active,
-                      token.plan_type, token.plan_title, token.subscription_end,
-                      token.sora2_supported, token.sora2_invite_code,
-                      token.sora2_redeemed_count, token.sora2_total_count,
-                      token.sora2_remaining_count, token.sora2_cooldown_until,
-                      token.image_enabled, token.video_enabled,
-                      token.image_concurrency, token.video_concurrency)
-
-                # Create stats entry
-                await conn.execute("""
-                    INSERT INTO token_stats (token_id) VALUES ($1)
-                """, token_id)
-
-                return token_id
+        # 单条语句同时写入 tokens 和 token_stats（自动提交，无需显式事务）
+        row = await pool.fetchrow(f"""
+            WITH t AS (
+                INSERT INTO tokens (token, email, username, name, st, rt, client_id, proxy_url, remark, expiry_time, is_active,
+                                   plan_type, plan_title, subscription_end, sora2_supported, sora2_invite_code,
+                                   sora2_redeemed_count, sora2_total_count, sora2_remaining_count, sora2_cooldown_until,
+                                   image_enabled, video_enabled, image_concurrency, video_concurrency)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18, $19, $20, $21, $22, $23, $24)
+                RETURNING {self._TOKEN_COLUMNS}
+            ), s AS (
+                INSERT INTO token_stats (token_id) SELECT id FROM t
+            )
+            SELECT * FROM t
+        """, token.token, token.email, "", token.name, token.st, token.rt, token.client_id, token.proxy_url,
+              token.remark, token.expiry_time, token.is_active,
+              token.plan_type, token.plan_title, token.subscription_end,
+              token.sora2_supported, token.sora2_invite_code,
+              token.sora2_redeemed_count, token.sora2_total_count,
+              token.sora2_remaining_count, token.sora2_cooldown_until,
+              token.image_enabled, token.video_enabled,
+              token.image_concurrency, token.video_concurrency)
+        return Token.from_row(row)
     
     async def get_token(self, token_id: int) -> Optional[Token]:
         """Get token by ID"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT * FROM tokens WHERE id = $1", token_id)
-            if row:
-                return Token(**dict(row))
-            return None
+        row = await pool.fetchrow(f"SELECT {self._TOKEN_COLUMNS} FROM tokens WHERE id = $1", token_id)
+        if row:
+            return Token.from_row(row)
+        return None
     
     async def get_token_by_value(self, token: str) -> Optional[Token]:
         """Get token by value"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT * FROM tokens WHERE token = $1", token)
-            if row:
-                return Token(**dict(row))
-            return None
+        row = await pool.fetchrow(f"SELECT {self._TOKEN_COLUMNS} FROM tokens WHERE token = $1", token)
+        if row:
+            return Token.from_row(row)
+        return None
 
     async def get_token_by_email(self, email: str) -> Optional[Token]:
         """Get token by email"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT * FROM tokens WHERE email = $1", email)
-            if row:
-                return Token(**dict(row))
-            return None
+        row = await pool.fetchrow(f"SELECT {self._TOKEN_COLUMNS} FROM tokens WHERE email = $1", email)
+        if row:
+            return Token.from_row(row)
+        return None
+    
+    async def get_tokens_by_ids(self, token_ids: List[int]) -> List[Token]:
+        """Get several tokens by ID in one query"""
+        pool = await self._get_pool()
+        rows = await pool.fetch(f"SELECT {self._TOKEN_COLUMNS} FROM tokens WHERE id = ANY($1::int[])", token_ids)
+        return [Token.from_row(row) for row in rows]
     
     async def get_active_tokens(self) -> List[Token]:
         """Get all active tokens (enabled, not cooled down, not expired)"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            rows = await conn.fetch("""
-                SELECT * FROM tokens
-                WHERE is_active = TRUE
-                AND (cooled_until IS NULL OR cooled_until < CURRENT_TIMESTAMP)
-                AND (expiry_time IS NULL OR expiry_time > CURRENT_TIMESTAMP)
-                ORDER BY last_used_at ASC NULLS FIRST
-            """)
-            return [Token(**dict(row)) for row in rows]
+        rows = await pool.fetch(f"""
+            SELECT {self._TOKEN_COLUMNS} FROM tokens
+            WHERE is_active = TRUE
+            AND (cooled_until IS NULL OR cooled_until < CURRENT_TIMESTAMP)
+            AND (expiry_time IS NULL OR expiry_time > CURRENT_TIMESTAMP)
+            ORDER BY last_used_at ASC NULLS FIRST
+        """)
+        return [Token.from_row(row) for row in rows]
     
     async def get_all_tokens(self) -> List[Token]:
         """Get all tokens"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            rows = await conn.fetch("SELECT * FROM tokens ORDER BY created_at DESC")
-            return [Token(**dict(row)) for row in rows]
+        rows = await pool.fetch(f"SELECT {self._TOKEN_COLUMNS} FROM tokens ORDER BY created_at DESC")
+        return [Token.from_row(row) for row in rows]
     
-    async def update_token_usage(self, token_id: int):
-        """Update token usage"""
+    async def iter_all_tokens(self, prefetch: int = 200) -> AsyncIterator[Token]:
+        """Iterate over all tokens with a server-side cursor (内存占用与表大小无关)"""
         pool = await self._get_pool()
         async with pool.acquire() as conn:
-            await conn.execute("""
-                UPDATE tokens 
-                SET last_used_at = CURRENT_TIMESTAMP, use_count = use_count + 1
-                WHERE id = $1
-            """, token_id)
+            # asyncpg 游标必须在事务内使用
+            async with conn.transaction():
+                async for row in conn.cursor(f"SELECT {self._TOKEN_COLUMNS} FROM tokens ORDER BY created_at DESC", prefetch=prefetch):
+                    yield Token.from_row(row)
+    
+    async def update_token_usage(self, token_id: int):
+        """Update token usage
+
+        Usage is buffered in memory and written by a single UPDATE per
+        flush interval, so last_used_at/use_count lag by up to
+        _USAGE_FLUSH_INTERVAL.
+        """
+        self._usage_buffer[token_id] = self._usage_buffer.get(token_id, 0) + 1
+        self._schedule_usage_flush()
+
+    def _schedule_usage_flush(self):
+        """Start the usage flush task if one is not already pending"""
+        if self._usage_flush is None and not self._closing:
+            self._usage_flush = self._start_flush(self._flush_token_usage())
+
+    async def _flush_token_usage(self):
+        """Write buffered token usage and generation counts after the flush interval"""
+        await asyncio.sleep(self._USAGE_FLUSH_INTERVAL)
+        self._usage_flush = None
+        usage_written = await self._write_token_usage()
+        counts_written = await self._write_generation_counts()
+        if not (usage_written and counts_written):
+            # 写入失败：计数已放回缓冲区，稍后重试
+            self._schedule_usage_flush()
+
+    async def _write_token_usage(self) -> bool:
+        """Apply all buffered usage counts in one UPDATE; returns False on failure"""
+        if not self._usage_buffer:
+            return True
+        usage, self._usage_buffer = self._usage_buffer, {}
+        written = False
+        try:
+            pool = await self._get_pool()
+            await pool.execute("""
+                UPDATE tokens AS t
+                SET last_used_at = CURRENT_TIMESTAMP, use_count = t.use_count + u.count
+                FROM unnest($1::int[], $2::int[]) AS u(id, count)
+                WHERE t.id = u.id
+            """, list(usage.keys()), list(usage.values()))
+            written = True
+        except Exception as e:
+            print(f"⚠️ Failed to write token usage: {e}")
+        finally:
+            if not written:
+                # 失败或被取消时放回缓冲区，由下一次刷新（或 close）重试
+                for token_id, count in usage.items():
+                    self._usage_buffer[token_id] = self._usage_buffer.get(token_id, 0) + count
+        return written
     
     async def update_token_status(self, token_id: int, is_active: bool):
         """Update token status"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                UPDATE tokens SET is_active = $1 WHERE id = $2
-            """, is_active, token_id)
+        await pool.execute("""
+            UPDATE tokens SET is_active = $1 WHERE id = $2
+        """, is_active, token_id)
 
     async def mark_token_expired(self, token_id: int):
         """Mark token as expired and disable it"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                UPDATE tokens SET is_expired = TRUE, is_active = FALSE WHERE id = $1
-            """, token_id)
+        await pool.execute("""
+            UPDATE tokens SET is_expired = TRUE, is_active = FALSE WHERE id = $1
+        """, token_id)
 
     async def clear_token_expired(self, token_id: int):
         """Clear token expired flag"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                UPDATE tokens SET is_expired = FALSE WHERE id = $1
-            """, token_id)
+        await pool.execute("""
+            UPDATE tokens SET is_expired = FALSE WHERE id = $1
+        """, token_id)
 
     async def update_token_sora2(self, token_id: int, supported: bool, invite_code: Optional[str] = None,
                                 redeemed_count: int = 0, total_count: int = 0, remaining_count: int = 0):
         """Update token Sora2 support info"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                UPDATE tokens
-                SET sora2_supported = $1, sora2_invite_code = $2, sora2_redeemed_count = $3, sora2_total_count = $4, sora2_remaining_count = $5
-                WHERE id = $6
-            """, supported, invite_code, redeemed_count, total_count, remaining_count, token_id)
+        await pool.execute("""
+            UPDATE tokens
+            SET sora2_supported = $1, sora2_invite_code = $2, sora2_redeemed_count = $3, sora2_total_count = $4, sora2_remaining_count = $5
+            WHERE id = $6
+        """, supported, invite_code, redeemed_count, total_count, remaining_count, token_id)
 
     async def update_token_sora2_remaining(self, token_id: int, remaining_count: int):
         """Update token Sora2 remaining count"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                UPDATE tokens SET sora2_remaining_count = $1 WHERE id = $2
-            """, remaining_count, token_id)
+        await pool.execute("""
+            UPDATE tokens SET sora2_remaining_count = $1 WHERE id = $2
+        """, remaining_count, token_id)
 
     async def update_token_sora2_cooldown(self, token_id: int, cooldown_until: Optional[datetime]):
         """Update token Sora2 cooldown time"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                UPDATE tokens SET sora2_cooldown_until = $1 WHERE id = $2
-            """, cooldown_until, token_id)
+        await pool.execute("""
+            UPDATE tokens SET sora2_cooldown_until = $1 WHERE id = $2
+        """, cooldown_until, token_id)
 
     async def update_token_cooldown(self, token_id: int, cooled_until: datetime):
         """Update token cooldown"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                UPDATE tokens SET cooled_until = $1 WHERE id = $2
-            """, cooled_until, token_id)
+        await pool.execute("""
+            UPDATE tokens SET cooled_until = $1 WHERE id = $2
+        """, cooled_until, token_id)
     
     async def delete_token(self, token_id: int):
         """Delete token"""
         pool = await self._get_pool()
+        if self._token_stats_cascade:
+            # token_stats 通过 ON DELETE CASCADE 随之删除
+            await pool.execute("DELETE FROM tokens WHERE id = $1", token_id)
+            return
         async with pool.acquire() as conn:
             async with conn.transaction():
                 await conn.execute("DELETE FROM token_stats WHERE token_id = $1", token_id)
@@ -426,156 +642,85 @@ class Database:
                           video_concurrency: Optional[int] = None):
         """Update token (AT, ST, RT, client_id, proxy_url, remark, expiry_time, subscription info, image_enabled, video_enabled)"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            # Build dynamic update query
-            updates = []
-            params = []
-            param_num = 1
-
-            if token is not None:
-                updates.append(f"token = ${param_num}")
-                params.append(token)
-                param_num += 1
-
-            if st is not None:
-                updates.append(f"st = ${param_num}")
-                params.append(st)
-                param_num += 1
-
-            if rt is not None:
-                updates.append(f"rt = ${param_num}")
-                params.append(rt)
-                param_num += 1
-
-            if client_id is not None:
-                updates.append(f"client_id = ${param_num}")
-                params.append(client_id)
-                param_num += 1
-
-            if proxy_url is not None:
-                updates.append(f"proxy_url = ${param_num}")
-                params.append(proxy_url)
-                param_num += 1
-
-            if remark is not None:
-                updates.append(f"remark = ${param_num}")
-                params.append(remark)
-                param_num += 1
-
-            if expiry_time is not None:
-                updates.append(f"expiry_time = ${param_num}")
-                params.append(expiry_time)
-                param_num += 1
-
-            if plan_type is not None:
-                updates.append(f"plan_type = ${param_num}")
-                params.append(plan_type)
-                param_num += 1
-
-            if plan_title is not None:
-                updates.append(f"plan_title = ${param_num}")
-                params.append(plan_title)
-                param_num += 1
-
-            if subscription_end is not None:
-                updates.append(f"subscription_end = ${param_num}")
-                params.append(subscription_end)
-                param_num += 1
-
-            if image_enabled is not None:
-                updates.append(f"image_enabled = ${param_num}")
-                params.append(image_enabled)
-                param_num += 1
-
-            if video_enabled is not None:
-                updates.append(f"video_enabled = ${param_num}")
-                params.append(video_enabled)
-                param_num += 1
-
-            if image_concurrency is not None:
-                updates.append(f"image_concurrency = ${param_num}")
-                params.append(image_concurrency)
-                param_num += 1
-
-            if video_concurrency is not None:
-                updates.append(f"video_concurrency = ${param_num}")
-                params.append(video_concurrency)
-                param_num += 1
-
-            if updates:
-                params.append(token_id)
-                query = f"UPDATE tokens SET {', '.join(updates)} WHERE id = ${param_num}"
-                await conn.execute(query, *params)
+        # Fixed statement (unset fields keep their value via COALESCE), so asyncpg
+        # reuses one prepared statement instead of one per field combination
+        await pool.execute("""
+            UPDATE tokens
+            SET token = COALESCE($1, token),
+                st = COALESCE($2, st),
+                rt = COALESCE($3, rt),
+                client_id = COALESCE($4, client_id),
+                proxy_url = COALESCE($5, proxy_url),
+                remark = COALESCE($6, remark),
+                expiry_time = COALESCE($7, expiry_time),
+                plan_type = COALESCE($8, plan_type),
+                plan_title = COALESCE($9, plan_title),
+                subscription_end = COALESCE($10, subscription_end),
+                image_enabled = COALESCE($11, image_enabled),
+                video_enabled = COALESCE($12, video_enabled),
+                image_concurrency = COALESCE($13, image_concurrency),
+                video_concurrency = COALESCE($14, video_concurrency)
+            WHERE id = $15
+        """, token, st, rt, client_id, proxy_url, remark, expiry_time, plan_type, plan_title,
+              subscription_end, image_enabled, video_enabled, image_concurrency, video_concurrency,
+              token_id)
 
     # Token stats operations
     async def get_token_stats(self, token_id: int) -> Optional[TokenStats]:
         """Get token statistics"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT * FROM token_stats WHERE token_id = $1", token_id)
-            if row:
-                row_dict = dict(row)
-                # Convert date object to string if present
-                if row_dict.get('today_date') and isinstance(row_dict['today_date'], date):
-                    row_dict['today_date'] = row_dict['today_date'].isoformat()
-                return TokenStats(**row_dict)
-            return None
+        row = await pool.fetchrow("SELECT * FROM token_stats WHERE token_id = $1", token_id)
+        if row:
+            return TokenStats.from_record(row)
+        return None
+
+    async def get_token_stats_by_ids(self, token_ids: List[int]) -> Dict[int, TokenStats]:
+        """Get statistics for several tokens in one query, keyed by token_id"""
+        pool = await self._get_pool()
+        rows = await pool.fetch("SELECT * FROM token_stats WHERE token_id = ANY($1::int[])", token_ids)
+        return {row["token_id"]: TokenStats.from_record(row) for row in rows}
     
     async def increment_image_count(self, token_id: int):
-        """Increment image generation count"""
-        from datetime import date
-        pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            today = date.today()
-            # Get current stats
-            row = await conn.fetchrow("SELECT today_date FROM token_stats WHERE token_id = $1", token_id)
-
-            # If date changed, reset today's count
-            if row and row['today_date'] != today:
-                await conn.execute("""
-                    UPDATE token_stats
-                    SET image_count = image_count + 1,
-                        today_image_count = 1,
-                        today_date = $1
-                    WHERE token_id = $2
-                """, today, token_id)
-            else:
-                # Same day, just increment both
-                await conn.execute("""
-                    UPDATE token_stats
-                    SET image_count = image_count + 1,
-                        today_image_count = today_image_count + 1,
-                        today_date = $1
-                    WHERE token_id = $2
-                """, today, token_id)
+        """Increment image generation count (buffered, see _write_generation_counts)"""
+        self._count_buffer.setdefault(token_id, [0, 0])[0] += 1
+        self._schedule_usage_flush()
 
     async def increment_video_count(self, token_id: int):
-        """Increment video generation count"""
-        from datetime import date
-        pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            today = date.today()
-            # Get current stats
-            row = await conn.fetchrow("SELECT today_date FROM token_stats WHERE token_id = $1", token_id)
-
-            # If date changed, reset today's count
-            if row and row['today_date'] != today:
-                await conn.execute("""
-                    UPDATE token_stats
-                    SET video_count = video_count + 1,
-                        today_video_count = 1,
-                        today_date = $1
-                    WHERE token_id = $2
-                """, today, token_id)
-            else:
-                # Same day, just increment both
-                await conn.execute("""
-                    UPDATE token_stats
-                    SET video_count = video_count + 1,
-                        today_video_count = today_video_count + 1,
-                        today_date = $1
-                    WHERE token_id = $2
-                """, today, token_id)
+        """Increment video generation count (buffered, see _write_generation_counts)"""
+        self._count_buffer.setdefault(token_id, [0, 0])[1] += 1
+        self._schedule_usage_flush()
+
+    async def _write_generation_counts(self) -> bool:
+        """Apply all buffered image/video counts in one UPDATE; returns False on failure"""
+        if not self._count_buffer:
+            return True
+        counts, self._count_buffer = self._count_buffer, {}
+        written = False
+        try:
+            pool = await self._get_pool()
+            # today's counts restart when the date has changed
+            await pool.execute("""
+                UPDATE token_stats AS s
+                SET image_count = s.image_count + u.images,
+                    video_count = s.video_count + u.videos,
+                    today_image_count = CASE WHEN s.today_date = $1 THEN s.today_image_count + u.images ELSE u.images END,
+                    today_video_count = CASE WHEN s.today_date = $1 THEN s.today_video_count + u.videos ELSE u.videos END,
+                    today_date = $1
+                FROM unnest($2::int[], $3::int[], $4::int[]) AS u(token_id, images, videos)
+                WHERE s.token_id = u.token_id
+            """, date.today(), list(counts.keys()),
+                [c[0] for c in counts.values()], [c[1] for c in counts.values()])
+            written = True
+        except Exception as e:
+            print(f"⚠️ Failed to write generation counts: {e}")
+        finally:
+            if not written:
+                # 失败或被取消时放回缓冲区，由下一次刷新（或 close）重试
+                for token_id, (images, videos) in counts.items():
+                    pending = self._count_buffer.setdefault(token_id, [0, 0])
+                    pending[0] += images
+                    pending[1] += videos
+        return written
     
     async def increment_error_count(self, token_id: int, increment_consecutive: bool = True):
         """Increment error count
@@ -584,420 +729,574 @@ class Database:
             token_id: Token ID
             increment_consecutive: Whether to increment consecutive error count (False for overload errors)
         """
-        from datetime import date
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            today = date.today()
-            # Get current stats
-            row = await conn.fetchrow("SELECT today_date FROM token_stats WHERE token_id = $1", token_id)
-
-            # If date changed, reset today's error count
-            if row and row['today_date'] != today:
-                if increment_consecutive:
-                    await conn.execute("""
-                        UPDATE token_stats
-                        SET error_count = error_count + 1,
-                            consecutive_error_count = consecutive_error_count + 1,
-                            today_error_count = 1,
-                            today_date = $1,
-                            last_error_at = CURRENT_TIMESTAMP
-                        WHERE token_id = $2
-                    """, today, token_id)
-                else:
-                    await conn.execute("""
-                        UPDATE token_stats
-                        SET error_count = error_count + 1,
-                            today_error_count = 1,
-                            today_date = $1,
-                            last_error_at = CURRENT_TIMESTAMP
-                        WHERE token_id = $2
-                    """, today, token_id)
-            else:
-                # Same day, just increment counters
-                if increment_consecutive:
-                    await conn.execute("""
-                        UPDATE token_stats
-                        SET error_count = error_count + 1,
-                            consecutive_error_count = consecutive_error_count + 1,
-                            today_error_count = today_error_count + 1,
-                            today_date = $1,
-                            last_error_at = CURRENT_TIMESTAMP
-                        WHERE token_id = $2
-                    """, today, token_id)
-                else:
-                    await conn.execute("""
-                        UPDATE token_stats
-                        SET error_count = error_count + 1,
-                            today_error_count = today_error_count + 1,
-                            today_date = $1,
-                            last_error_at = CURRENT_TIMESTAMP
-                        WHERE token_id = $2
-                    """, today, token_id)
+        today = date.today()
+        # Single UPDATE: today's error count restarts at 1 when the date has changed
+        await pool.execute("""
+            UPDATE token_stats
+            SET error_count = error_count + 1,
+                consecutive_error_count = consecutive_error_count + CASE WHEN $3 THEN 1 ELSE 0 END,
+                today_error_count = CASE WHEN today_date = $1 THEN today_error_count + 1 ELSE 1 END,
+                today_date = $1,
+                last_error_at = CURRENT_TIMESTAMP
+            WHERE token_id = $2
+        """, today, token_id, increment_consecutive)
     
     async def reset_error_count(self, token_id: int):
         """Reset consecutive error count (keep total error_count)"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                UPDATE token_stats SET consecutive_error_count = 0 WHERE token_id = $1
-            """, token_id)
+        await pool.execute("""
+            UPDATE token_stats SET consecutive_error_count = 0 WHERE token_id = $1
+        """, token_id)
     
     # Task operations
     async def create_task(self, task: Task) -> int:
-        """Create a new task"""
+        """Create a new task
+
+        Concurrent submissions are coalesced into a single INSERT; the call
+        returns once the row has been written.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending_tasks.append((task, future))
+        if len(self._pending_tasks) >= self._TASK_BATCH_MAX:
+            self._task_batch_full.set()
+        if self._task_flush is None:
+            self._task_flush = self._start_flush(self._flush_pending_tasks())
+        return await future
+
+    async def _flush_pending_tasks(self):
+        """Write the tasks queued by create_task after the batch window"""
+        batch = None
+        try:
+            try:
+                await asyncio.wait_for(self._task_batch_full.wait(), self._TASK_BATCH_WINDOW)
+            except asyncio.TimeoutError:
+                pass
+            batch, self._pending_tasks = self._pending_tasks, []
+            self._task_batch_full.clear()
+            self._task_flush = None
+
+            try:
+                ids = await self.create_tasks([task for task, _ in batch])
+            except Exception:
+                # 批量写入失败时逐条重试，避免一条坏数据拖垮同批的其他请求
+                for task, future in batch:
+                    # 调用方已取消（如客户端断开）的任务不再写入
+                    if future.done():
+                        continue
+                    try:
+                        row_id = await self._insert_task(task)
+                    except Exception as e:
+                        if not future.done():
+                            future.set_exception(e)
+                    else:
+                        if not future.done():
+                            future.set_result(row_id)
+                return
+
+            for (_, future), row_id in zip(batch, ids):
+                if not future.done():
+                    future.set_result(row_id)
+        finally:
+            if batch is None:
+                # 在批处理窗口内被取消：接管已排队的任务，避免调用方永远等待
+                batch, self._pending_tasks = self._pending_tasks, []
+                self._task_batch_full.clear()
+                self._task_flush = None
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Task batch write was interrupted"))
+
+    async def create_tasks(self, tasks: List[Task]) -> List[int]:
+        """Create multiple tasks in one round trip, returning their ids in order"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            task_id = await conn.fetchval("""
-                INSERT INTO tasks (task_id, token_id, model, prompt, status, progress)
-                VALUES ($1, $2, $3, $4, $5, $6)
-                RETURNING id
-            """, task.task_id, task.token_id, task.model, task.prompt, task.status, task.progress)
-            return task_id
+        rows = await pool.fetch("""
+            INSERT INTO tasks (task_id, token_id, model, prompt, status, progress)
+            SELECT * FROM unnest($1::text[], $2::int[], $3::text[], $4::text[], $5::text[], $6::float8[])
+            RETURNING id, task_id
+        """,
+            [t.task_id for t in tasks], [t.token_id for t in tasks], [t.model for t in tasks],
+            [t.prompt for t in tasks], [t.status for t in tasks], [t.progress for t in tasks])
+        ids = {row["task_id"]: row["id"] for row in rows}
+        return [ids[t.task_id] for t in tasks]
+
+    async def _insert_task(self, task: Task) -> int:
+        """Insert a single task row"""
+        pool = await self._get_pool()
+        task_id = await pool.fetchval("""
+            INSERT INTO tasks (task_id, token_id, model, prompt, status, progress)
+            VALUES ($1, $2, $3, $4, $5, $6)
+            RETURNING id
+        """, task.task_id, task.token_id, task.model, task.prompt, task.status, task.progress)
+        return task_id
     
     async def update_task(self, task_id: str, status: str, progress: float, 
-                         result_urls: Optional[str] = None, error_message: Optional[str] = None):
+                         result_urls: Optional[Union[List[str], Dict[str, Any]]] = None,
+                         error_message: Optional[str] = None):
         """Update task status"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            completed_at = datetime.now() if status in ["completed", "failed"] else None
-            await conn.execute("""
-                UPDATE tasks 
-                SET status = $1, progress = $2, result_urls = $3, error_message = $4, completed_at = $5
-                WHERE task_id = $6
-            """, status, progress, result_urls, error_message, completed_at, task_id)
+        completed_at = datetime.now() if status in ["completed", "failed"] else None
+        if result_urls is not None:
+            result_urls = orjson.dumps(result_urls).decode()
+        await pool.execute("""
+            UPDATE tasks 
+            SET status = $1, progress = $2, result_urls = $3, error_message = $4, completed_at = $5
+            WHERE task_id = $6
+        """, status, progress, result_urls, error_message, completed_at, task_id)
     
     async def get_task(self, task_id: str) -> Optional[Task]:
         """Get task by ID"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT * FROM tasks WHERE task_id = $1", task_id)
-            if row:
-                return Task(**dict(row))
-            return None
+        row = await pool.fetchrow(f"SELECT {self._TASK_COLUMNS} FROM tasks WHERE task_id = $1", task_id)
+        if row:
+            return Task.from_row(row)
+        return None
     
     # Request log operations
     async def log_request(self, log: RequestLog) -> int:
-        """Log a request and return log ID"""
+        """Log a request and return log ID
+
+        The ID is reserved from the table's sequence up front so it can be
+        returned immediately; the row itself is written in a batched COPY.
+        """
+        log_id = await self._next_log_id()
+        if len(self._log_buffer) >= self._LOG_BUFFER_LIMIT:
+            # 缓冲区已满：先同步写入，避免无限增长
+            await self._write_request_logs()
+        self._log_buffer[log_id] = [log_id, log.token_id, log.task_id, log.operation, log.request_body,
+                                    log.response_body, log.status_code, log.duration, None]
+        if len(self._log_buffer) >= self._LOG_BATCH_MAX:
+            self._log_batch_full.set()
+        if self._log_flush is None and not self._closing:
+            self._log_flush = self._start_flush(self._flush_request_logs())
+        return log_id
+
+    async def _next_log_id(self) -> int:
+        """Take a request_logs ID from the locally reserved block"""
+        if not self._log_ids:
+            async with self._log_ids_lock:
+                if not self._log_ids:
+                    pool = await self._get_pool()
+                    rows = await pool.fetch("""
+                        SELECT nextval(pg_get_serial_sequence('request_logs', 'id'))
+                        FROM generate_series(1, $1)
+                    """, self._LOG_ID_BLOCK)
+                    self._log_ids = [row[0] for row in reversed(rows)]
+        return self._log_ids.pop()
+
+    async def _flush_request_logs(self):
+        """Write the logs queued by log_request after the batch window"""
+        try:
+            await asyncio.wait_for(self._log_batch_full.wait(), self._LOG_BATCH_WINDOW)
+        except asyncio.TimeoutError:
+            pass
+        self._log_flush = None
+        await self._write_request_logs()
+
+    async def _write_request_logs(self):
+        """COPY all queued request logs into request_logs"""
+        self._log_batch_full.clear()
+        if not self._log_buffer:
+            return
+        async with self._log_write_lock:
+            if not self._log_buffer:
+                return
+            self._log_inflight, self._log_buffer = self._log_buffer, {}
+            self._log_inflight_done = done = asyncio.Event()
+            try:
+                await self._copy_request_logs(list(self._log_inflight.values()))
+            finally:
+                self._log_inflight = {}
+                done.set()
+
+    async def _copy_request_logs(self, records: List[list]):
+        """Write log rows (COPY for large batches, one unnest INSERT otherwise), falling back to per-row inserts
+
+        A buffered row's updated_at only marks that it was updated; the
+        timestamp is taken from the database clock at write time, as for
+        rows updated after they were written.
+        """
+        updated = self._LOG_FIELD["updated_at"]
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            log_id = await conn.fetchval("""
-                INSERT INTO request_logs (token_id, task_id, operation, request_body, response_body, status_code, duration)
-                VALUES ($1, $2, $3, $4, $5, $6, $7)
-                RETURNING id
-            """, log.token_id, log.task_id, log.operation, log.request_body, log.response_body,
-                  log.status_code, log.duration)
-            return log_id
+        try:
+            if len(records) >= self._LOG_COPY_MIN:
+                async with pool.acquire() as conn:
+                    rows = records
+                    if any(record[updated] for record in records):
+                        now = await conn.fetchval("SELECT LOCALTIMESTAMP")
+                        rows = [record[:updated] + [now if record[updated] else None] for record in records]
+                    await conn.copy_records_to_table("request_logs", records=rows, columns=self._LOG_COLUMNS)
+            else:
+                # 小批量时 COPY 的协议开销不划算，用一条 INSERT ... unnest
+                await pool.execute("""
+                    INSERT INTO request_logs (id, token_id, task_id, operation, request_body, response_body, status_code, duration, updated_at)
+                    SELECT id, token_id, task_id, operation, request_body, response_body, status_code, duration,
+                           CASE WHEN updated THEN CURRENT_TIMESTAMP END
+                    FROM unnest($1::int[], $2::int[], $3::text[], $4::text[], $5::text[], $6::text[], $7::int[],
+                                $8::float8[], $9::bool[])
+                         AS u(id, token_id, task_id, operation, request_body, response_body, status_code, duration, updated)
+                """, *(list(column) for column in zip(*records)))
+        except Exception as e:
+            # 整批失败（如某行 token_id 已被删除）时逐条写入，只丢弃坏行
+            print(f"⚠️ Failed to write request logs in batch, falling back to inserts: {e}")
+            for record in records:
+                try:
+                    await pool.execute("""
+                        INSERT INTO request_logs (id, token_id, task_id, operation, request_body, response_body, status_code, duration, updated_at)
+                        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, CASE WHEN $9::bool THEN CURRENT_TIMESTAMP END)
+                    """, *record)
+                except Exception as row_error:
+                    print(f"⚠️ Failed to write request log: {row_error}")
 
     async def update_request_log(self, log_id: int, response_body: Optional[str] = None,
                                  status_code: Optional[int] = None, duration: Optional[float] = None,
                                  token_id: Optional[int] = None, task_id: Optional[str] = None):
         """Update request log with completion data"""
+        # 尚未写入的日志直接在缓冲区中修改，插入和更新合并为一次写入
+        pending = self._log_buffer.get(log_id)
+        if pending is not None:
+            self._apply_log_update(pending, response_body=response_body, status_code=status_code,
+                                   duration=duration, token_id=token_id, task_id=task_id)
+            return
+        if log_id in self._log_inflight:
+            # 该行正在写入：等这批写完再 UPDATE，否则 UPDATE 会先于 INSERT 执行而落空
+            await self._log_inflight_done.wait()
+        if response_body is None and status_code is None and duration is None and token_id is None and task_id is None:
+            return
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            updates = []
-            params = []
-            param_num = 1
-
-            if response_body is not None:
-                updates.append(f"response_body = ${param_num}")
-                params.append(response_body)
-                param_num += 1
-            if status_code is not None:
-                updates.append(f"status_code = ${param_num}")
-                params.append(status_code)
-                param_num += 1
-            if duration is not None:
-                updates.append(f"duration = ${param_num}")
-                params.append(duration)
-                param_num += 1
-            if token_id is not None:
-                updates.append(f"token_id = ${param_num}")
-                params.append(token_id)
-                param_num += 1
-            if task_id is not None:
-                updates.append(f"task_id = ${param_num}")
-                params.append(task_id)
-                param_num += 1
-
-            if updates:
-                updates.append("updated_at = CURRENT_TIMESTAMP")
-                params.append(log_id)
-                query = f"UPDATE request_logs SET {', '.join(updates)} WHERE id = ${param_num}"
-                await conn.execute(query, *params)
+        # Fixed statement text so it stays in the prepared-statement cache; NULL keeps the current value
+        await pool.execute("""
+            UPDATE request_logs
+            SET response_body = COALESCE($1, response_body),
+                status_code = COALESCE($2, status_code),
+                duration = COALESCE($3, duration),
+                token_id = COALESCE($4, token_id),
+                task_id = COALESCE($5, task_id),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = $6
+        """, response_body, status_code, duration, token_id, task_id, log_id)
     
     async def update_request_log_by_task_id(self, task_id: str, response_body: Optional[str] = None,
                                            status_code: Optional[int] = None, duration: Optional[float] = None):
         """Update request log by task_id"""
+        # 缓冲区中属于该任务的日志直接修改；已写入的由下面的 UPDATE 处理
+        task_field = self._LOG_FIELD["task_id"]
+        for pending in self._log_buffer.values():
+            if pending[task_field] == task_id:
+                self._apply_log_update(pending, response_body=response_body,
+                                       status_code=status_code, duration=duration)
+        if any(row[task_field] == task_id for row in self._log_inflight.values()):
+            await self._log_inflight_done.wait()
+        if response_body is None and status_code is None and duration is None:
+            return
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            updates = []
-            params = []
-            param_num = 1
-
-            if response_body is not None:
-                updates.append(f"response_body = ${param_num}")
-                params.append(response_body)
-                param_num += 1
-            if status_code is not None:
-                updates.append(f"status_code = ${param_num}")
-                params.append(status_code)
-                param_num += 1
-            if duration is not None:
-                updates.append(f"duration = ${param_num}")
-                params.append(duration)
-                param_num += 1
-
-            if updates:
-                updates.append("updated_at = CURRENT_TIMESTAMP")
-                params.append(task_id)
-                query = f"UPDATE request_logs SET {', '.join(updates)} WHERE task_id = ${param_num}"
-                await conn.execute(query, *params)
+        await pool.execute("""
+            UPDATE request_logs
+            SET response_body = COALESCE($1, response_body),
+                status_code = COALESCE($2, status_code),
+                duration = COALESCE($3, duration),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE task_id = $4
+        """, response_body, status_code, duration, task_id)
     
+    def _apply_log_update(self, row: list, **fields):
+        """Apply non-None field updates to a buffered log row and mark it updated"""
+        changed = False
+        for name, value in fields.items():
+            if value is not None:
+                row[self._LOG_FIELD[name]] = value
+                changed = True
+        if changed:
+            row[self._LOG_FIELD["updated_at"]] = True
+
     async def get_recent_logs(self, limit: int = 100) -> List[dict]:
         """Get recent logs with token email"""
+        if self._log_buffer:
+            await self._write_request_logs()
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            rows = await conn.fetch("""
-                SELECT
-                    rl.id,
-                    rl.token_id,
-                    rl.task_id,
-                    rl.operation,
-                    rl.request_body,
-                    rl.response_body,
-                    rl.status_code,
-                    rl.duration,
-                    rl.created_at,
-                    t.email as token_email,
-                    t.username as token_username
-                FROM request_logs rl
-                LEFT JOIN tokens t ON rl.token_id = t.id
-                ORDER BY rl.created_at DESC
-                LIMIT $1
-            """, limit)
-            return [dict(row) for row in rows]
+        rows = await pool.fetch("""
+            SELECT
+                rl.id,
+                rl.token_id,
+                rl.task_id,
+                rl.operation,
+                rl.request_body,
+                rl.response_body,
+                rl.status_code,
+                rl.duration,
+                rl.created_at,
+                t.email as token_email,
+                t.username as token_username
+            FROM request_logs rl
+            LEFT JOIN tokens t ON rl.token_id = t.id
+            ORDER BY rl.created_at DESC
+            LIMIT $1
+        """, limit)
+        return [dict(row) for row in rows]
 
     async def clear_all_logs(self):
         """Clear all request logs"""
+        # 持有写入锁：正在写入的一批先提交，再丢弃尚未写入的日志并 TRUNCATE（不逐行删除、不产生逐行 WAL）
+        async with self._log_write_lock:
+            self._log_buffer.clear()
+            pool = await self._get_pool()
+            await pool.execute("TRUNCATE request_logs")
+
+    async def _fetch_config(self, table: str, model):
+        """Load the single row of a config table as `model` (cached in-process for _CONFIG_TTL)
+
+        Config models are frozen, so the cached instance is shared by all callers.
+        Returns None if the row does not exist.
+        """
+        now = time.monotonic()
+        cached = self._config_cache.get(table)
+        if cached is not None and now - cached[0] < self._CONFIG_TTL:
+            return cached[1]
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("DELETE FROM request_logs")
+        row = await pool.fetchrow(f"SELECT * FROM {table} WHERE id = 1")
+        config = model.from_record(row) if row else None
+        self._config_cache[table] = (now, config)
+        return config
 
     # Admin config operations
     async def get_admin_config(self) -> AdminConfig:
         """Get admin configuration"""
-        pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT * FROM admin_config WHERE id = 1")
-            if row:
-                return AdminConfig(**dict(row))
-            # If no row exists, return a default config with placeholder values
-            # This should not happen in normal operation as _ensure_config_rows should create it
-            return AdminConfig(admin_username="admin", admin_password="admin", api_key="han1234")
+        config = await self._fetch_config("admin_config", AdminConfig)
+        if config is not None:
+            return config
+        # If no row exists, return a default config with placeholder values
+        # This should not happen in normal operation as _ensure_config_rows should create it
+        return AdminConfig(admin_username="admin", admin_password="admin", api_key="han1234")
     
     async def update_admin_config(self, config: AdminConfig):
         """Update admin configuration"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                UPDATE admin_config
-                SET admin_username = $1, admin_password = $2, api_key = $3, error_ban_threshold = $4, updated_at = CURRENT_TIMESTAMP
-                WHERE id = 1
-            """, config.admin_username, config.admin_password, config.api_key, config.error_ban_threshold)
+        await pool.execute("""
+            UPDATE admin_config
+            SET admin_username = $1, admin_password = $2, api_key = $3, error_ban_threshold = $4, updated_at = CURRENT_TIMESTAMP
+            WHERE id = 1
+        """, config.admin_username, config.admin_password, config.api_key, config.error_ban_threshold)
+        self._config_cache.pop("admin_config", None)
     
     # Admin session operations
     async def create_admin_session(self, token: str, expires_at: Optional[datetime] = None):
         """Create a new admin session"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                INSERT INTO admin_sessions (token, expires_at)
-                VALUES ($1, $2)
-                ON CONFLICT (token) DO UPDATE
-                SET last_used_at = CURRENT_TIMESTAMP, expires_at = $2
-            """, token, expires_at)
+        row = await pool.fetchrow("""
+            INSERT INTO admin_sessions (token, expires_at)
+            VALUES ($1, $2)
+            ON CONFLICT (token) DO UPDATE
+            SET last_used_at = CURRENT_TIMESTAMP, expires_at = EXCLUDED.expires_at
+            RETURNING *
+        """, token, expires_at)
+        self._session_cache[token] = (time.monotonic(), dict(row))
     
-    async def get_admin_session(self, token: str) -> Optional[dict]:
-        """Get admin session by token"""
-        pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow("""
-                SELECT * FROM admin_sessions
-                WHERE token = $1
-                AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
-            """, token)
-            if row:
-                return dict(row)
+    async def get_admin_session(self, token: str) -> Optional[Mapping[str, Any]]:
+        """Get admin session by token (cached in-process for _SESSION_CACHE_TTL)
+
+        The session is a read-only mapping shared by all callers.
+        """
+        now = time.monotonic()
+        cached = self._session_cache.get(token)
+        if cached is not None and now - cached[0] < self._SESSION_CACHE_TTL:
+            session = cached[1]
+            if session["expires_at"] is None or session["expires_at"] > datetime.now():
+                return session
+            self._session_cache.pop(token, None)
             return None
+        pool = await self._get_pool()
+        row = await pool.fetchrow("""
+            SELECT * FROM admin_sessions
+            WHERE token = $1
+            AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
+        """, token)
+        if row:
+            session = MappingProxyType(dict(row))
+            self._session_cache[token] = (now, session)
+            return session
+        self._session_cache.pop(token, None)
+        return None
     
     async def update_admin_session_last_used(self, token: str):
-        """Update admin session last used time"""
-        pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("""
+        """Record admin session use; last_used_at is written in batches"""
+        self._pending_touch.add(token)
+        if self._touch_flush is None and not self._closing:
+            self._touch_flush = self._start_flush(self._flush_session_touches())
+
+    async def _flush_session_touches(self):
+        """Write pending session touches after the flush interval"""
+        await asyncio.sleep(self._SESSION_TOUCH_INTERVAL)
+        self._touch_flush = None
+        await self._write_session_touches()
+
+    async def _write_session_touches(self):
+        """Bump last_used_at for all pending sessions in one UPDATE"""
+        if not self._pending_touch:
+            return
+        tokens, self._pending_touch = self._pending_touch, set()
+        try:
+            pool = await self._get_pool()
+            await pool.execute("""
                 UPDATE admin_sessions
                 SET last_used_at = CURRENT_TIMESTAMP
-                WHERE token = $1
-            """, token)
+                WHERE token = ANY($1::text[])
+            """, list(tokens))
+        except Exception as e:
+            # 使用时间仅用于展示，失败时丢弃即可
+            print(f"⚠️ Failed to update admin session last_used_at: {e}")
     
     async def delete_admin_session(self, token: str):
         """Delete admin session"""
+        self._session_cache.pop(token, None)
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("DELETE FROM admin_sessions WHERE token = $1", token)
+        await pool.execute("DELETE FROM admin_sessions WHERE token = $1", token)
     
     async def cleanup_expired_admin_sessions(self):
         """Clean up expired admin sessions"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("DELETE FROM admin_sessions WHERE expires_at IS NOT NULL AND expires_at < CURRENT_TIMESTAMP")
+        await pool.execute("DELETE FROM admin_sessions WHERE expires_at IS NOT NULL AND expires_at < CURRENT_TIMESTAMP")
+        self._session_cache.clear()
+
+    async def start_session_cleanup_task(self):
+        """Start background cleanup of expired admin sessions"""
+        if self._session_cleanup_task is None:
+            self._session_cleanup_task = asyncio.create_task(self._session_cleanup_loop())
+
+    async def stop_session_cleanup_task(self):
+        """Stop background session cleanup"""
+        if self._session_cleanup_task:
+            self._session_cleanup_task.cancel()
+            try:
+                await self._session_cleanup_task
+            except asyncio.CancelledError:
+                pass
+            self._session_cleanup_task = None
+
+    async def _session_cleanup_loop(self):
+        """Delete expired admin sessions periodically (uses idx_admin_sessions_expires_at)"""
+        while True:
+            try:
+                await asyncio.sleep(self._SESSION_CLEANUP_INTERVAL)
+                await self.cleanup_expired_admin_sessions()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"⚠️ Admin session cleanup failed: {e}")
     
     # Proxy config operations
     async def get_proxy_config(self) -> ProxyConfig:
         """Get proxy configuration"""
-        pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT * FROM proxy_config WHERE id = 1")
-            if row:
-                return ProxyConfig(**dict(row))
-            # If no row exists, return a default config
-            # This should not happen in normal operation as _ensure_config_rows should create it
-            return ProxyConfig(proxy_enabled=False)
+        config = await self._fetch_config("proxy_config", ProxyConfig)
+        if config is not None:
+            return config
+        # If no row exists, return a default config
+        # This should not happen in normal operation as _ensure_config_rows should create it
+        return ProxyConfig(proxy_enabled=False)
     
     async def update_proxy_config(self, enabled: bool, proxy_url: Optional[str]):
         """Update proxy configuration"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                UPDATE proxy_config
-                SET proxy_enabled = $1, proxy_url = $2, updated_at = CURRENT_TIMESTAMP
-                WHERE id = 1
-            """, enabled, proxy_url)
+        await pool.execute("""
+            UPDATE proxy_config
+            SET proxy_enabled = $1, proxy_url = $2, updated_at = CURRENT_TIMESTAMP
+            WHERE id = 1
+        """, enabled, proxy_url)
+        self._config_cache.pop("proxy_config", None)
 
     # Watermark-free config operations
     async def get_watermark_free_config(self) -> WatermarkFreeConfig:
         """Get watermark-free configuration"""
-        pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT * FROM watermark_free_config WHERE id = 1")
-            if row:
-                return WatermarkFreeConfig(**dict(row))
-            # If no row exists, return a default config
-            # This should not happen in normal operation as _ensure_config_rows should create it
-            return WatermarkFreeConfig(watermark_free_enabled=False, parse_method="third_party")
+        config = await self._fetch_config("watermark_free_config", WatermarkFreeConfig)
+        if config is not None:
+            return config
+        # If no row exists, return a default config
+        # This should not happen in normal operation as _ensure_config_rows should create it
+        return WatermarkFreeConfig(watermark_free_enabled=False, parse_method="third_party")
 
     async def update_watermark_free_config(self, enabled: bool, parse_method: str = None,
                                           custom_parse_url: str = None, custom_parse_token: str = None):
         """Update watermark-free configuration"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            if parse_method is None and custom_parse_url is None and custom_parse_token is None:
-                # Only update enabled status
-                await conn.execute("""
-                    UPDATE watermark_free_config
-                    SET watermark_free_enabled = $1, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = 1
-                """, enabled)
-            else:
-                # Update all fields
-                await conn.execute("""
-                    UPDATE watermark_free_config
-                    SET watermark_free_enabled = $1, parse_method = $2, custom_parse_url = $3,
-                        custom_parse_token = $4, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = 1
-                """, enabled, parse_method or "third_party", custom_parse_url, custom_parse_token)
+        if parse_method is None and custom_parse_url is None and custom_parse_token is None:
+            # Only update enabled status
+            await pool.execute("""
+                UPDATE watermark_free_config
+                SET watermark_free_enabled = $1, updated_at = CURRENT_TIMESTAMP
+                WHERE id = 1
+            """, enabled)
+        else:
+            # Update all fields
+            await pool.execute("""
+                UPDATE watermark_free_config
+                SET watermark_free_enabled = $1, parse_method = $2, custom_parse_url = $3,
+                    custom_parse_token = $4, updated_at = CURRENT_TIMESTAMP
+                WHERE id = 1
+            """, enabled, parse_method or "third_party", custom_parse_url, custom_parse_token)
+        self._config_cache.pop("watermark_free_config", None)
 
     # Cache config operations
     async def get_cache_config(self) -> CacheConfig:
         """Get cache configuration"""
-        pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT * FROM cache_config WHERE id = 1")
-            if row:
-                return CacheConfig(**dict(row))
-            # If no row exists, return a default config
-            # This should not happen in normal operation as _ensure_config_rows should create it
-            return CacheConfig(cache_enabled=False, cache_timeout=600)
+        config = await self._fetch_config("cache_config", CacheConfig)
+        if config is not None:
+            return config
+        # If no row exists, return a default config
+        # This should not happen in normal operation as _ensure_config_rows should create it
+        return CacheConfig(cache_enabled=False, cache_timeout=600)
 
     async def update_cache_config(self, enabled: bool = None, timeout: int = None, base_url: Optional[str] = None):
         """Update cache configuration"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            # Get current config first
-            row = await conn.fetchrow("SELECT * FROM cache_config WHERE id = 1")
-
-            if row:
-                current = dict(row)
-                # Update only provided fields
-                new_enabled = enabled if enabled is not None else current.get("cache_enabled", False)
-                new_timeout = timeout if timeout is not None else current.get("cache_timeout", 600)
-                new_base_url = base_url if base_url is not None else current.get("cache_base_url")
-            else:
-                new_enabled = enabled if enabled is not None else False
-                new_timeout = timeout if timeout is not None else 600
-                new_base_url = base_url
-
-            # Convert empty string to None
-            new_base_url = new_base_url if new_base_url else None
-
-            await conn.execute("""
-                UPDATE cache_config
-                SET cache_enabled = $1, cache_timeout = $2, cache_base_url = $3, updated_at = CURRENT_TIMESTAMP
-                WHERE id = 1
-            """, new_enabled, new_timeout, new_base_url)
+        # Update only provided fields (NULL keeps the current value); empty base_url is stored as NULL
+        await pool.execute("""
+            UPDATE cache_config
+            SET cache_enabled = COALESCE($1, cache_enabled),
+                cache_timeout = COALESCE($2, cache_timeout),
+                cache_base_url = NULLIF(COALESCE($3, cache_base_url), ''),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = 1
+        """, enabled, timeout, base_url)
+        self._config_cache.pop("cache_config", None)
 
     # Generation config operations
     async def get_generation_config(self) -> GenerationConfig:
         """Get generation configuration"""
-        pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT * FROM generation_config WHERE id = 1")
-            if row:
-                return GenerationConfig(**dict(row))
-            # If no row exists, return a default config
-            # This should not happen in normal operation as _ensure_config_rows should create it
-            return GenerationConfig(image_timeout=300, video_timeout=3000)
+        config = await self._fetch_config("generation_config", GenerationConfig)
+        if config is not None:
+            return config
+        # If no row exists, return a default config
+        # This should not happen in normal operation as _ensure_config_rows should create it
+        return GenerationConfig(image_timeout=300, video_timeout=3000)
 
     async def update_generation_config(self, image_timeout: int = None, video_timeout: int = None):
         """Update generation configuration"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            # Get current config first
-            row = await conn.fetchrow("SELECT * FROM generation_config WHERE id = 1")
-
-            if row:
-                current = dict(row)
-                # Update only provided fields
-                new_image_timeout = image_timeout if image_timeout is not None else current.get("image_timeout", 300)
-                new_video_timeout = video_timeout if video_timeout is not None else current.get("video_timeout", 3000)
-            else:
-                new_image_timeout = image_timeout if image_timeout is not None else 300
-                new_video_timeout = video_timeout if video_timeout is not None else 3000
-
-            await conn.execute("""
-                UPDATE generation_config
-                SET image_timeout = $1, video_timeout = $2, updated_at = CURRENT_TIMESTAMP
-                WHERE id = 1
-            """, new_image_timeout, new_video_timeout)
+        # Update only provided fields (NULL keeps the current value)
+        await pool.execute("""
+            UPDATE generation_config
+            SET image_timeout = COALESCE($1, image_timeout),
+                video_timeout = COALESCE($2, video_timeout),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = 1
+        """, image_timeout, video_timeout)
+        self._config_cache.pop("generation_config", None)
 
     # Token refresh config operations
     async def get_token_refresh_config(self) -> TokenRefreshConfig:
         """Get token refresh configuration"""
-        pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT * FROM token_refresh_config WHERE id = 1")
-            if row:
-                return TokenRefreshConfig(**dict(row))
-            # If no row exists, return a default config
-            # This should not happen in normal operation as _ensure_config_rows should create it
-            return TokenRefreshConfig(at_auto_refresh_enabled=False)
+        config = await self._fetch_config("token_refresh_config", TokenRefreshConfig)
+        if config is not None:
+            return config
+        # If no row exists, return a default config
+        # This should not happen in normal operation as _ensure_config_rows should create it
+        return TokenRefreshConfig(at_auto_refresh_enabled=False)
 
     async def update_token_refresh_config(self, at_auto_refresh_enabled: bool):
         """Update token refresh configuration"""
         pool = await self._get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                UPDATE token_refresh_config
-                SET at_auto_refresh_enabled = $1, updated_at = CURRENT_TIMESTAMP
-                WHERE id = 1
-            """, at_auto_refresh_enabled)
+        await pool.execute("""
+            UPDATE token_refresh_config
+            SET at_auto_refresh_enabled = $1, updated_at = CURRENT_TIMESTAMP
+            WHERE id = 1
+        """, at_auto_refresh_enabled)
+        self._config_cache.pop("token_refresh_config", None)
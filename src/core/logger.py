@@ -3,7 +3,7 @@ import json
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Mapping, Optional
 from .config import config
 
 class DebugLogger:
@@ -49,6 +49,12 @@ class DebugLogger:
             return token
         return f"{token[:6]}...{token[-6:]}"
     
+    def _mask_header(self, key: str, value: str) -> str:
+        """Mask the bearer token of an Authorization header (header names are case-insensitive)"""
+        if key.lower() == "authorization" and value.startswith("Bearer "):
+            return f"Bearer {self._mask_token(value[7:])}"
+        return value
+    
     def _format_timestamp(self) -> str:
         """Format current timestamp"""
         return datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
@@ -61,7 +67,7 @@ class DebugLogger:
         self,
         method: str,
         url: str,
-        headers: Dict[str, str],
+        headers: Mapping[str, str],
         body: Optional[Any] = None,
         files: Optional[Dict] = None,
         proxy: Optional[str] = None
@@ -83,19 +89,13 @@ class DebugLogger:
 
             # Headers
             self.logger.info("\n📋 Headers:")
-            masked_headers = dict(headers)
-            if "Authorization" in masked_headers:
-                auth_value = masked_headers["Authorization"]
-                if auth_value.startswith("Bearer "):
-                    token = auth_value[7:]
-                    masked_headers["Authorization"] = f"Bearer {self._mask_token(token)}"
-
-            for key, value in masked_headers.items():
-                self.logger.info(f"  {key}: {value}")
+            for key, value in headers.items():
+                self.logger.info(f"  {key}: {self._mask_header(key, value)}")
 
             # Body
             if body is not None:
                 self.logger.info("\n📦 Request Body:")
+                body = self._decode_body(body)
                 if isinstance(body, (dict, list)):
                     body_str = json.dumps(body, indent=2, ensure_ascii=False)
                     self.logger.info(body_str)
@@ -130,7 +130,7 @@ class DebugLogger:
     def log_response(
         self,
         status_code: int,
-        headers: Dict[str, str],
+        headers: Mapping[str, str],
         body: Any,
         duration_ms: Optional[float] = None
     ):
@@ -160,6 +160,9 @@ class DebugLogger:
 
             # Body
             self.logger.info("\n📦 Response Body:")
+            if isinstance(body, (bytes, bytearray)):
+                # 原始 bytes 只 decode 一次，JSON 解析交给下面的 str 分支
+                body = body.decode('utf-8', errors='ignore')
             if isinstance(body, (dict, list)):
                 body_str = json.dumps(body, indent=2, ensure_ascii=False)
                 self.logger.info(body_str)
@@ -238,11 +241,21 @@ class DebugLogger:
         except Exception as e:
             self.logger.error(f"Error logging info: {e}")
     
+    @staticmethod
+    def _decode_body(body: Any) -> Any:
+        """Parse a raw (bytes) body as JSON, falling back to text; other values pass through"""
+        if isinstance(body, (bytes, bytearray)):
+            try:
+                return json.loads(body)
+            except ValueError:
+                return body.decode('utf-8', errors='ignore')
+        return body
+    
     def log_api_request(
         self,
         method: str,
         path: str,
-        headers: Dict[str, str],
+        headers: Mapping[str, str],
         body: Optional[Any] = None,
         client_ip: Optional[str] = None
     ):
@@ -260,19 +273,13 @@ class DebugLogger:
             
             # Headers (mask sensitive info)
             self.logger.info("\n📋 Headers:")
-            masked_headers = dict(headers)
-            if "Authorization" in masked_headers:
-                auth_value = masked_headers["Authorization"]
-                if auth_value.startswith("Bearer "):
-                    token = auth_value[7:]
-                    masked_headers["Authorization"] = f"Bearer {self._mask_token(token)}"
-            
-            for key, value in masked_headers.items():
-                self.logger.info(f"  {key}: {value}")
+            for key, value in headers.items():
+                self.logger.info(f"  {key}: {self._mask_header(key, value)}")
             
             # Body
             if body is not None:
                 self.logger.info("\n📦 Request Body:")
+                body = self._decode_body(body)
                 if isinstance(body, (dict, list)):
                     body_str = json.dumps(body, indent=2, ensure_ascii=False)
                     # Limit body size for very large requests
@@ -297,7 +304,7 @@ class DebugLogger:
         self,
         status_code: int,
         path: str,
-        headers: Dict[str, str],
+        headers: Mapping[str, str],
         body: Any,
         duration_ms: Optional[float] = None
     ):
@@ -323,6 +330,9 @@ class DebugLogger:
             
             # Body
             self.logger.info("\n📦 Response Body:")
+            if isinstance(body, (bytes, bytearray)):
+                # 原始 bytes 只 decode 一次，JSON 解析交给下面的 str 分支
+                body = body.decode('utf-8', errors='ignore')
             if isinstance(body, (dict, list)):
                 body_str = json.dumps(body, indent=2, ensure_ascii=False)
                 # Limit body size for very large responses
@@ -364,9 +374,14 @@ class DebugLogger:
         error_message: str,
         status_code: Optional[int] = None,
         client_ip: Optional[str] = None,
-        traceback_str: Optional[str] = None
+        traceback_str: Optional[str] = None,
+        exc_info: Optional[BaseException] = None
     ):
-        """Log API error - always logs regardless of debug_enabled"""
+        """Log API error - always logs regardless of debug_enabled
+
+        Pass the exception as exc_info to let logging format the traceback
+        only when a handler actually emits the record.
+        """
         try:
             self._write_separator()
             self.logger.info(f"🔴 [API ERROR] {self._format_timestamp()}")
@@ -384,6 +399,8 @@ class DebugLogger:
             if traceback_str:
                 self.logger.info("\n📋 Traceback:")
                 self.logger.info(traceback_str)
+            elif exc_info is not None:
+                self.logger.info("\n📋 Traceback:", exc_info=exc_info)
             
             self._write_separator()
             self.logger.info("")  # Empty line
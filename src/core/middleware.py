@@ -1,48 +1,120 @@
 """Middleware for request/response logging"""
+import asyncio
+import os
 import time
-import json
-from typing import Callable
+import orjson
+from typing import Callable, Optional
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import StreamingResponse, Response as StarletteResponse
 from .logger import debug_logger
 
+# 仅记录响应体的前 MAX_CAPTURE_BYTES 字节，响应本身原样流式发送
+MAX_CAPTURE_BYTES = 8192
+# 超过该大小、大小未知或二进制/multipart 的请求体不读取，只记录大小和类型
+LOG_BODY_MAX_BYTES = 64 * 1024
+_UNLOGGED_CONTENT_TYPES = ("multipart/", "application/octet-stream")
+
+# 不记录日志的路径（探活、文档、静态文件），可通过 LOG_SKIP_PATHS 环境变量覆盖（逗号分隔，以 / 结尾表示前缀）
+_DEFAULT_SKIP_LOG_PATHS = "/health,/metrics,/docs,/redoc,/openapi.json,/favicon.ico,/static/,/tmp/"
+_skip_log_entries = [p.strip() for p in os.getenv("LOG_SKIP_PATHS", _DEFAULT_SKIP_LOG_PATHS).split(",") if p.strip()]
+_SKIP_LOG_PATHS = frozenset(p for p in _skip_log_entries if not p.endswith("/"))
+_SKIP_LOG_PREFIXES = tuple(p for p in _skip_log_entries if p.endswith("/"))
+
+# 日志事件队列：请求路径只入队，格式化和输出由后台任务完成
+_LOG_QUEUE_MAX = 10000
+_log_events: Optional[asyncio.Queue] = None
+_log_worker: Optional[asyncio.Task] = None
+_dropped_log_events = 0
+
+
+def _emit(log_fn: Callable, **kwargs):
+    """Queue a debug_logger call; runs inline if the worker is not running"""
+    global _dropped_log_events
+    if _log_events is None:
+        log_fn(**kwargs)
+        return
+    try:
+        _log_events.put_nowait((log_fn, kwargs))
+    except asyncio.QueueFull:
+        _dropped_log_events += 1
+
+
+async def _drain_log_events():
+    """Background consumer for queued log events"""
+    global _dropped_log_events
+    while True:
+        log_fn, kwargs = await _log_events.get()
+        if _dropped_log_events:
+            debug_logger.logger.warning(f"⚠️ Log queue full, dropped {_dropped_log_events} log events")
+            _dropped_log_events = 0
+        log_fn(**kwargs)
+
+
+def start_log_worker():
+    """Start the background log consumer (call from app startup)"""
+    global _log_events, _log_worker
+    if _log_worker is None:
+        _log_events = asyncio.Queue(maxsize=_LOG_QUEUE_MAX)
+        _log_worker = asyncio.create_task(_drain_log_events())
+
+
+async def stop_log_worker():
+    """Stop the consumer and write out whatever is still queued"""
+    global _log_events, _log_worker
+    if _log_worker is None:
+        return
+    _log_worker.cancel()
+    try:
+        await _log_worker
+    except asyncio.CancelledError:
+        pass
+    events, _log_events, _log_worker = _log_events, None, None
+    while not events.empty():
+        log_fn, kwargs = events.get_nowait()
+        log_fn(**kwargs)
+
 
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
     """Middleware to log all API requests and responses"""
     
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         """Process request and log it"""
+        path = request.url.path
+        if path in _SKIP_LOG_PATHS or path.startswith(_SKIP_LOG_PREFIXES):
+            return await call_next(request)
+
         start_time = time.time()
         
         # Get client IP
         client_ip = request.client.host if request.client else "unknown"
         
-        # Read request body
+        # Read request body（原始 bytes 直接交给 logger，由日志后台任务按需解析）
         body = None
-        body_bytes = b""
         try:
             # Check if request has body
             if request.method in ["POST", "PUT", "PATCH"]:
-                body_bytes = await request.body()
-                if body_bytes:
-                    try:
-                        body = json.loads(body_bytes.decode('utf-8'))
-                    except json.JSONDecodeError:
-                        body = body_bytes.decode('utf-8', errors='ignore')
-                    
-                    # Recreate request with body for downstream handlers
-                    async def receive():
-                        return {"type": "http.request", "body": body_bytes}
-                    request._receive = receive
+                omitted = self._omitted_body_reason(request)
+                if omitted:
+                    # 不读取请求体，保持上传流式传给下游
+                    body = omitted
+                else:
+                    body_bytes = await request.body()
+                    if body_bytes:
+                        body = body_bytes
+                        
+                        # Recreate request with body for downstream handlers
+                        async def receive():
+                            return {"type": "http.request", "body": body_bytes}
+                        request._receive = receive
         except Exception as e:
             debug_logger.logger.error(f"Error reading request body: {e}")
         
         # Log request
-        debug_logger.log_api_request(
+        _emit(
+            debug_logger.log_api_request,
             method=request.method,
             path=request.url.path,
-            headers=dict(request.headers),
+            headers=request.headers,
             body=body,
             client_ip=client_ip
         )
@@ -54,103 +126,101 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
             # Calculate duration
             duration_ms = (time.time() - start_time) * 1000
             
-            # Handle streaming responses
-            if isinstance(response, StreamingResponse):
-                # For streaming responses, we can't read the body easily
-                # Just log the headers and status
-                debug_logger.log_api_response(
-                    status_code=response.status_code,
-                    path=request.url.path,
-                    headers=dict(response.headers),
-                    body="<Streaming Response>",
-                    duration_ms=duration_ms
-                )
-                return response
-            
-            # Read response body for non-streaming responses
-            response_body = None
-            try:
-                # Try to get response body from different response types
-                response_body_bytes = None
-                
-                # Check if it's a JSONResponse (FastAPI)
-                if hasattr(response, 'body') and response.body:
-                    response_body_bytes = response.body
-                elif hasattr(response, 'render'):
-                    # Try to render the response
-                    try:
-                        rendered = await response.render()
-                        if isinstance(rendered, bytes):
-                            response_body_bytes = rendered
-                    except:
-                        pass
-                
-                # If we still don't have body, try reading from iterator
-                if response_body_bytes is None and hasattr(response, 'body_iterator'):
-                    response_body_bytes = b""
-                    async for chunk in response.body_iterator:
-                        response_body_bytes += chunk
-                    
-                    # Recreate response with the body we read
-                    response = StarletteResponse(
-                        content=response_body_bytes,
-                        status_code=response.status_code,
-                        headers=dict(response.headers),
-                        media_type=getattr(response, 'media_type', None)
-                    )
-                
-                # Parse response body
-                if response_body_bytes:
-                    try:
-                        if isinstance(response_body_bytes, bytes):
-                            response_body = json.loads(response_body_bytes.decode('utf-8'))
-                        else:
-                            response_body = json.loads(str(response_body_bytes))
-                    except (json.JSONDecodeError, UnicodeDecodeError, TypeError):
-                        if isinstance(response_body_bytes, bytes):
-                            response_body = response_body_bytes.decode('utf-8', errors='ignore')
-                        else:
-                            response_body = str(response_body_bytes)
-                        # Limit length
-                        if len(response_body) > 5000:
-                            response_body = response_body[:5000] + "... (truncated)"
-            except Exception as e:
-                debug_logger.logger.error(f"Error reading response body: {e}")
-                response_body = "<Unable to read response body>"
-            
-            # Log response (including error responses)
-            debug_logger.log_api_response(
-                status_code=response.status_code,
-                path=request.url.path,
-                headers=dict(response.headers),
-                body=response_body,
-                duration_ms=duration_ms
+            # BaseHTTPMiddleware 的 call_next 总是返回流式的 _StreamingResponse，
+            # body 只能从 body_iterator 读取：边发送边截取前 MAX_CAPTURE_BYTES 字节用于日志
+            response.body_iterator = self._capture_body(
+                response.body_iterator, request, response, duration_ms, client_ip
             )
-            
-            # If it's an error response, also log as error
-            if response.status_code >= 400:
-                error_msg = f"HTTP {response.status_code} Error"
-                if response_body:
-                    if isinstance(response_body, dict):
-                        error_msg = response_body.get("error", {}).get("message", str(response_body))
-                    else:
-                        error_msg = str(response_body)
-                debug_logger.log_api_error(
-                    path=request.url.path,
-                    error_message=error_msg,
-                    status_code=response.status_code,
-                    client_ip=client_ip
-                )
-            
             return response
             
         except Exception as e:
             # Log error
             duration_ms = (time.time() - start_time) * 1000
-            debug_logger.log_api_error(
+            _emit(
+                debug_logger.log_api_error,
                 path=request.url.path,
                 error_message=str(e),
                 status_code=500,
                 client_ip=client_ip
             )
             raise
+
+    @staticmethod
+    def _omitted_body_reason(request: Request) -> str:
+        """Return a placeholder if the request body should not be read for logging, else ''"""
+        content_type = request.headers.get("content-type", "")
+        content_length = request.headers.get("content-length")
+        if content_length is None:
+            if request.headers.get("transfer-encoding"):
+                return f"<omitted: streamed body, content-type={content_type}>"
+            return ""
+        try:
+            size = int(content_length)
+        except ValueError:
+            return f"<omitted: invalid content-length, content-type={content_type}>"
+        if size > LOG_BODY_MAX_BYTES or content_type.startswith(_UNLOGGED_CONTENT_TYPES):
+            return f"<omitted: {size} bytes, content-type={content_type}>"
+        return ""
+
+    async def _capture_body(self, body_iterator, request: Request, response: Response,
+                            duration_ms: float, client_ip: str):
+        """Pass response chunks through unchanged, keeping the first MAX_CAPTURE_BYTES for the log"""
+        captured = bytearray()
+        truncated = False
+        try:
+            async for chunk in body_iterator:
+                data = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+                remaining = MAX_CAPTURE_BYTES - len(captured)
+                if len(data) > remaining:
+                    truncated = True
+                if remaining > 0:
+                    captured += data[:remaining]
+                yield chunk
+        finally:
+            response_body = None
+            if captured:
+                if truncated:
+                    captured += b"... (truncated)"
+                response_body = bytes(captured)
+            self._log_response(request, response, response_body, duration_ms, client_ip)
+
+    @staticmethod
+    def _error_message(response_body) -> str:
+        """Extract the error message from an error response body"""
+        if isinstance(response_body, bytes):
+            try:
+                # orjson 直接解析 bytes（含 UTF-8 校验），无需先 decode
+                parsed = orjson.loads(response_body)
+            except orjson.JSONDecodeError:
+                return response_body[:5000].decode('utf-8', errors='ignore')
+            if isinstance(parsed, dict):
+                return parsed.get("error", {}).get("message", str(parsed))
+            return str(parsed)
+        return str(response_body)
+
+    @staticmethod
+    def _log_response(request: Request, response: Response, response_body, duration_ms: float, client_ip: str):
+        """Log the response, and log it again as an error for 4xx/5xx"""
+        # Log response (including error responses)
+        _emit(
+            debug_logger.log_api_response,
+            status_code=response.status_code,
+            path=request.url.path,
+            headers=response.headers,
+            body=response_body,
+            duration_ms=duration_ms
+        )
+        
+        # If it's an error response, also log as error
+        if response.status_code >= 400:
+            error_msg = f"HTTP {response.status_code} Error"
+            if response_body:
+                # 仅错误响应才解析 body 以提取错误信息
+                error_msg = RequestLoggingMiddleware._error_message(response_body)
+            _emit(
+                debug_logger.log_api_error,
+                path=request.url.path,
+                error_message=error_msg,
+                status_code=response.status_code,
+                client_ip=client_ip
+            )
@@ -1,10 +1,68 @@
 """Data models"""
+import sys
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional, List, Union, Dict, Any
-from pydantic import BaseModel
+import orjson
+from pydantic import BaseModel, Field
 
-class Token(BaseModel):
+# 内部数据模型（数据库行）使用 slots dataclass：不做校验，实例更小、属性访问更快
+# 单行配置模型为 frozen：缓存的实例可被所有调用方共享，修改需用 dataclasses.replace
+# HTTP 请求/响应模型仍使用 pydantic
+
+class _Record:
+    """Base for internal row models"""
+    __slots__ = ()
+    # 取值集合很小的字符串列（模型名、状态、套餐类型等），从数据库读出时 intern，
+    # 相同取值的行共享同一个 str 对象
+    _INTERNED: tuple = ()
+    # 列名 -> 解码函数：数据库中的存储格式与字段声明类型不同的列，在构造时转换
+    _DECODERS: dict = {}
+
+    @classmethod
+    def column_list(cls) -> str:
+        """Column names in field order, for explicit SELECT/RETURNING lists read back with from_row()"""
+        return ", ".join(cls.__dataclass_fields__)
+
+    @classmethod
+    def from_record(cls, record):
+        """Build from a database row without validation (数据库行已是正确类型，忽略模型外的列)"""
+        fields = cls.__dataclass_fields__
+        return cls._build({key: value for key, value in record.items() if key in fields})
+
+    @classmethod
+    def from_row(cls, record):
+        """Build from a row selected with column_list(): every column is a field, so nothing is filtered"""
+        if not cls._INTERNED and not cls._DECODERS:
+            return cls(**record)
+        return cls._build(dict(record.items()))
+
+    @classmethod
+    def _build(cls, data: dict):
+        for key in cls._INTERNED:
+            value = data.get(key)
+            if value:
+                data[key] = sys.intern(value)
+        for key, decode in cls._DECODERS.items():
+            if key in data:
+                data[key] = decode(data[key])
+        return cls(**data)
+
+def _load_result_urls(value: Optional[str]) -> Optional[Union[List[str], Dict[str, Any]]]:
+    """Decode the stored result_urls JSON into a URL list (or character info dict)"""
+    if not value:
+        return None
+    try:
+        parsed = orjson.loads(value)
+    except orjson.JSONDecodeError:
+        # Not valid JSON - treat the raw value as a single URL
+        return [value]
+    return parsed if isinstance(parsed, (list, dict)) else [parsed]
+
+@dataclass(slots=True, kw_only=True)
+class Token(_Record):
     """Token model"""
+    _INTERNED = ("plan_type", "plan_title")
     id: Optional[int] = None
     token: str
     email: str
@@ -41,7 +99,8 @@ class Token(BaseModel):
     # 过期标记
     is_expired: bool = False  # Token是否已过期（401 token_invalidated）
 
-class TokenStats(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class TokenStats(_Record):
     """Token statistics"""
     id: Optional[int] = None
     token_id: int
@@ -55,8 +114,11 @@ class TokenStats(BaseModel):
     today_date: Optional[str] = None
     consecutive_error_count: int = 0  # Consecutive errors for auto-disable
 
-class Task(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Task(_Record):
     """Task model"""
+    _INTERNED = ("model", "status")
+    _DECODERS = {"result_urls": _load_result_urls}
     id: Optional[int] = None
     task_id: str
     token_id: int
@@ -64,12 +126,13 @@ class Task(BaseModel):
     prompt: str
     status: str = "processing"  # processing/completed/failed
     progress: float = 0.0
-    result_urls: Optional[str] = None  # JSON array
+    result_urls: Optional[Union[List[str], Dict[str, Any]]] = None  # URL列表或角色信息字典（数据库中存为JSON文本，读取时由 _DECODERS 解码）
     error_message: Optional[str] = None
     created_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
 
-class RequestLog(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class RequestLog(_Record):
     """Request log model"""
     id: Optional[int] = None
     token_id: Optional[int] = None
@@ -82,7 +145,8 @@ class RequestLog(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-class AdminConfig(BaseModel):
+@dataclass(slots=True, kw_only=True, frozen=True)
+class AdminConfig(_Record):
     """Admin configuration"""
     id: int = 1
     admin_username: str  # Read from database, initialized from setting.toml on first startup
@@ -91,7 +155,8 @@ class AdminConfig(BaseModel):
     error_ban_threshold: int = 3
     updated_at: Optional[datetime] = None
 
-class ProxyConfig(BaseModel):
+@dataclass(slots=True, kw_only=True, frozen=True)
+class ProxyConfig(_Record):
     """Proxy configuration"""
     id: int = 1
     proxy_enabled: bool  # Read from database, initialized from setting.toml on first startup
@@ -99,7 +164,8 @@ class ProxyConfig(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-class WatermarkFreeConfig(BaseModel):
+@dataclass(slots=True, kw_only=True, frozen=True)
+class WatermarkFreeConfig(_Record):
     """Watermark-free mode configuration"""
     id: int = 1
     watermark_free_enabled: bool  # Read from database, initialized from setting.toml on first startup
@@ -109,7 +175,8 @@ class WatermarkFreeConfig(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-class CacheConfig(BaseModel):
+@dataclass(slots=True, kw_only=True, frozen=True)
+class CacheConfig(_Record):
     """Cache configuration"""
     id: int = 1
     cache_enabled: bool  # Read from database, initialized from setting.toml on first startup
@@ -118,7 +185,8 @@ class CacheConfig(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-class GenerationConfig(BaseModel):
+@dataclass(slots=True, kw_only=True, frozen=True)
+class GenerationConfig(_Record):
     """Generation timeout configuration"""
     id: int = 1
     image_timeout: int  # Read from database, initialized from setting.toml on first startup
@@ -126,7 +194,8 @@ class GenerationConfig(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-class TokenRefreshConfig(BaseModel):
+@dataclass(slots=True, kw_only=True, frozen=True)
+class TokenRefreshConfig(_Record):
     """Token refresh configuration"""
     id: int = 1
     at_auto_refresh_enabled: bool  # Read from database, initialized from setting.toml on first startup
@@ -136,7 +205,9 @@ class TokenRefreshConfig(BaseModel):
 # API Request/Response models
 class ChatMessage(BaseModel):
     role: str
-    content: Union[str, List[dict]]  # Support both string and array format (OpenAI multimodal)
+    # Support both string and array format (OpenAI multimodal)
+    # left_to_right: 纯文本（最常见）命中 str 后直接返回，不再尝试 list 分支
+    content: Union[str, List[Dict[str, Any]]] = Field(..., union_mode='left_to_right')
 
 class ChatCompletionRequest(BaseModel):
     model: str
@@ -161,54 +232,40 @@ class ChatCompletionResponse(BaseModel):
     choices: List[ChatCompletionChoice]
 
 # New API Request Models
-class ImageGenerateRequest(BaseModel):
-    """文生图请求"""
+# 生成类请求的公共字段；各请求只声明自己特有的字段
+class _GenerationRequest(BaseModel):
     prompt: str
-    model: str = "gpt-image"  # gpt-image, gpt-image-landscape, gpt-image-portrait
     stream: bool = False
     async_mode: bool = False  # 异步模式：立即返回task_id，不等待结果
 
-class ImageTransformRequest(BaseModel):
-    """图生图请求"""
-    prompt: str
-    image: str  # Base64 encoded image
+class _ImageRequest(_GenerationRequest):
     model: str = "gpt-image"  # gpt-image, gpt-image-landscape, gpt-image-portrait
-    stream: bool = False
-    async_mode: bool = False  # 异步模式：立即返回task_id，不等待结果
 
-class VideoGenerateRequest(BaseModel):
-    """文生视频请求"""
-    prompt: str
+class _VideoRequest(_GenerationRequest):
     model: str = "sora2-landscape-10s"  # sora2-* models
     style: Optional[str] = None  # 风格ID，如 anime, retro 等
-    stream: bool = False
-    async_mode: bool = False  # 异步模式：立即返回task_id，不等待结果
 
-class VideoTransformRequest(BaseModel):
+class ImageGenerateRequest(_ImageRequest):
+    """文生图请求"""
+
+class ImageTransformRequest(_ImageRequest):
+    """图生图请求"""
+    image: str  # Base64 encoded image
+
+class VideoGenerateRequest(_VideoRequest):
+    """文生视频请求"""
+
+class VideoTransformRequest(_VideoRequest):
     """图生视频请求"""
-    prompt: str
     image: str  # Base64 encoded image
-    model: str = "sora2-landscape-10s"  # sora2-* models
-    style: Optional[str] = None  # 风格ID，如 anime, retro 等
-    stream: bool = False
-    async_mode: bool = False  # 异步模式：立即返回task_id，不等待结果
 
-class VideoRemixRequest(BaseModel):
+class VideoRemixRequest(_VideoRequest):
     """Remix 视频请求"""
-    prompt: str
     remix_target_id: str  # Sora share link video ID (s_xxx)
-    model: str = "sora2-landscape-10s"  # sora2-* models
-    style: Optional[str] = None  # 风格ID，如 anime, retro 等
-    stream: bool = False
-    async_mode: bool = False  # 异步模式：立即返回task_id，不等待结果
 
-class VideoStoryboardRequest(BaseModel):
+class VideoStoryboardRequest(_VideoRequest):
     """视频分镜请求"""
     prompt: str  # 分镜格式：```[时长s]提示词``` 或 [时长s]提示词
-    model: str = "sora2-landscape-10s"  # sora2-* models
-    style: Optional[str] = None  # 风格ID，如 anime, retro 等
-    stream: bool = False
-    async_mode: bool = False  # 异步模式：立即返回task_id，不等待结果
 
 class CharacterCreateRequest(BaseModel):
     """创建角色请求"""
@@ -1,7 +1,8 @@
 """Main application entry point"""
+import sys
 import uvicorn
 from fastapi import FastAPI
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
@@ -9,7 +10,7 @@ from pathlib import Path
 # Import modules
 from .core.config import config
 from .core.database import Database
-from .core.middleware import RequestLoggingMiddleware
+from .core.middleware import RequestLoggingMiddleware, start_log_worker, stop_log_worker
 from .services.token_manager import TokenManager
 from .services.proxy_manager import ProxyManager
 from .services.load_balancer import LoadBalancer
@@ -23,7 +24,9 @@ from .api import admin as admin_routes
 app = FastAPI(
     title="Sora2API",
     description="OpenAI compatible API for Sora",
-    version="1.0.0"
+    version="1.0.0",
+    # 所有路由（含管理接口）返回的 dict 默认用 orjson 编码
+    default_response_class=ORJSONResponse
 )
 
 # Request logging middleware (add first to log all requests)
@@ -100,6 +103,9 @@ async def manage_page():
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup"""
+    # Start background writer for API request/response logs
+    start_log_worker()
+
     # Get config from setting.toml
     config_dict = config.get_raw_config()
 
@@ -141,16 +147,25 @@ async def startup_event():
     # Start file cache cleanup task
     await generation_handler.file_cache.start_cleanup_task()
 
+    # Start expired admin session cleanup task
+    await db.start_session_cleanup_task()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
     await generation_handler.file_cache.stop_cleanup_task()
+    await db.stop_session_cleanup_task()
     await db.close()
+    await stop_log_worker()
 
 if __name__ == "__main__":
     uvicorn.run(
         "src.main:app",
         host=config.server_host,
         port=config.server_port,
+        # uvicorn[standard] 提供 uvloop/httptools（uvloop 不支持 Windows）
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        timeout_keep_alive=config.server_timeout_keep_alive,
         reload=False
     )
@@ -1,13 +1,12 @@
 """Generation handling module"""
-import json
 import asyncio
-import base64
+import orjson
+import binascii
 import time
 import random
 import re
 import uuid
-from typing import Optional, AsyncGenerator, Dict, Any, Tuple
-from datetime import datetime
+from typing import Optional, AsyncGenerator, Dict, Any, Tuple, Union
 from .sora_client import SoraClient
 from .token_manager import TokenManager
 from .load_balancer import LoadBalancer
@@ -158,6 +157,12 @@ MODEL_CONFIG = {
     }
 }
 
+# Pre-encoded SSE stream terminator
+_SSE_DONE = b'data: [DONE]\n\n'
+
+# base64 payloads longer than this are decoded off the event loop
+_OFFLOAD_DECODE_THRESHOLD = 256 * 1024
+
 class GenerationHandler:
     """Handle generation requests"""
 
@@ -187,19 +192,34 @@ class GenerationHandler:
         # Otherwise use server address
         return f"http://{config.server_host}:{config.server_port}"
     
-    def _decode_base64_image(self, image_str: str) -> bytes:
+    def _decode_data_uri(self, data: str) -> bytes:
+        """Strip an optional data URI prefix (e.g. "data:image/png;base64,") and decode the base64 payload"""
+        # 只做一次 ASCII 编码，用 memoryview 跳过前缀，避免对多 MB 的 payload 再切片复制
+        raw = data.encode("ascii")
+        start = 0
+        if data.startswith("data:"):
+            idx = raw.find(b",")
+            if idx != -1:
+                start = idx + 1
+        return binascii.a2b_base64(memoryview(raw)[start:])
+
+    async def _decode_base64(self, data: str) -> bytes:
+        """Decode base64 data, in a worker thread for large payloads
+
+        Slicing and decoding multi-MB payloads on the event loop would stall
+        every other in-flight request.
+        """
+        if len(data) > _OFFLOAD_DECODE_THRESHOLD:
+            return await asyncio.to_thread(self._decode_data_uri, data)
+        return self._decode_data_uri(data)
+
+    async def _decode_base64_image(self, image_str: str) -> bytes:
         """Decode base64 image"""
-        # Remove data URI prefix if present
-        if "," in image_str:
-            image_str = image_str.split(",", 1)[1]
-        return base64.b64decode(image_str)
+        return await self._decode_base64(image_str)
 
-    def _decode_base64_video(self, video_str: str) -> bytes:
+    async def _decode_base64_video(self, video_str: str) -> bytes:
         """Decode base64 video"""
-        # Remove data URI prefix if present
-        if "," in video_str:
-            video_str = video_str.split(",", 1)[1]
-        return base64.b64decode(video_str)
+        return await self._decode_base64(video_str)
 
     def _process_character_username(self, username_hint: str) -> str:
         """Process character username from API response
@@ -337,6 +357,36 @@ class GenerationHandler:
         token_obj = await self.load_balancer.select_token(for_image_generation=is_image, for_video_generation=is_video)
         return token_obj is not None
 
+    async def _run_submitted_task(self, task_id: str, token_obj, model: str,
+                                  model_config: Dict, prompt: str, has_image: bool):
+        """Record an async-mode submission, then poll the task until it finishes"""
+        is_video = model_config["type"] == "video"
+        try:
+            # Create initial log entry
+            # Use model_config['type'] to ensure consistency with handle_generation
+            await self._log_request(
+                token_obj.id,
+                f"generate_{model_config['type']}",
+                {"model": model, "prompt": prompt, "has_image": has_image},
+                {},
+                -1,
+                -1.0,
+                task_id=task_id
+            )
+
+            # Record usage
+            await self.token_manager.record_usage(token_obj.id, is_video=is_video)
+        except Exception as e:
+            debug_logger.log_error(
+                error_message=f"Failed to record submission of task {task_id}: {str(e)}",
+                status_code=500,
+                response_text=str(e)
+            )
+
+        await self._poll_task_result_background(
+            task_id, token_obj.token, is_video, prompt, token_obj.id
+        )
+
     async def submit_generation_task(self, model: str, prompt: str,
                                      image: Optional[str] = None,
                                      video: Optional[str] = None,
@@ -424,7 +474,7 @@ class GenerationHandler:
                 # Upload image if provided
                 media_id = None
                 if image:
-                    image_data = self._decode_base64_image(image)
+                    image_data = await self._decode_base64_image(image)
                     media_id = await self.sora_client.upload_image(image_data, token_obj.token)
                 
                 # Generate task
@@ -486,24 +536,11 @@ class GenerationHandler:
                 )
                 await self.db.create_task(task)
                 
-                # Create initial log entry
-                # Use model_config['type'] to ensure consistency with handle_generation
-                await self._log_request(
-                    token_obj.id,
-                    f"generate_{model_config['type']}",
-                    {"model": model, "prompt": prompt, "has_image": image is not None},
-                    {},
-                    -1,
-                    -1.0,
-                    task_id=task_id
-                )
-                
-                # Record usage
-                await self.token_manager.record_usage(token_obj.id, is_video=is_video)
-                
-                # Start background polling task
-                asyncio.create_task(self._poll_task_result_background(
-                    task_id, token_obj.token, is_video, prompt, token_obj.id
+                # Request log, usage accounting and polling run in the background,
+                # so the client gets its task_id as soon as the task row exists
+                asyncio.create_task(self._run_submitted_task(
+                    task_id, token_obj, model, model_config, prompt,
+                    has_image=image is not None
                 ))
                 
                 return task_id, task_type
@@ -572,7 +609,7 @@ class GenerationHandler:
             # Update request log
             await self.db.update_request_log_by_task_id(
                 task_id,
-                response_body=json.dumps({"error": str(e), "status": "failed"}),
+                response_body=orjson.dumps({"error": str(e), "status": "failed"}).decode(),
                 status_code=500,
                 duration=-1.0  # Duration unknown for failed tasks
             )
@@ -799,7 +836,7 @@ class GenerationHandler:
                     video_bytes = await self._download_file(video_data)
                 else:
                     # It's a base64 encoded string (already processed by route)
-                    video_bytes = base64.b64decode(video_data)
+                    video_bytes = await self._decode_base64_video(video_data)
             else:
                 # Assume it's already bytes
                 video_bytes = video_data
@@ -883,7 +920,7 @@ class GenerationHandler:
             }
             await self.db.update_task(
                 task_id, "completed", 100.0,
-                result_urls=json.dumps(result_data)
+                result_urls=result_data
             )
             
             # Record success
@@ -966,7 +1003,7 @@ class GenerationHandler:
                     video_bytes = await self._download_file(video_data)
                 else:
                     # It's a base64 encoded string (already processed by route)
-                    video_bytes = base64.b64decode(video_data)
+                    video_bytes = await self._decode_base64_video(video_data)
             else:
                 # Assume it's already bytes
                 video_bytes = video_data
@@ -1080,11 +1117,48 @@ class GenerationHandler:
             )
             raise
 
+    async def handle_single(self, model: str, prompt: str,
+                            image: Optional[str] = None,
+                            video: Optional[str] = None,
+                            remix_target_id: Optional[str] = None) -> str:
+        """Handle non-streaming generation request (availability check only)
+
+        Returns the complete response directly instead of through an async generator.
+
+        Args:
+            model: Model name
+            prompt: Generation prompt
+            image: Base64 encoded image
+            video: Base64 encoded video or video URL
+            remix_target_id: Sora share link video ID for remix
+        """
+        # Validate model
+        if model not in MODEL_CONFIG:
+            raise ValueError(f"Invalid model: {model}")
+
+        model_config = MODEL_CONFIG[model]
+        is_video = model_config["type"] == "video"
+        is_image = model_config["type"] == "image"
+
+        available = await self.check_token_availability(is_image, is_video)
+        if available:
+            if is_image:
+                message = "All tokens available for image generation. Please enable streaming to use the generation feature."
+            else:
+                message = "All tokens available for video generation. Please enable streaming to use the generation feature."
+        else:
+            if is_image:
+                message = "No available models for image generation"
+            else:
+                message = "No available models for video generation"
+
+        return self._format_non_stream_response(message, is_availability_check=True)
+
     async def handle_generation(self, model: str, prompt: str,
                                image: Optional[str] = None,
                                video: Optional[str] = None,
                                remix_target_id: Optional[str] = None,
-                               stream: bool = True) -> AsyncGenerator[str, None]:
+                               stream: bool = True) -> AsyncGenerator[Union[bytes, str], None]:
         """Handle generation request
 
         Args:
@@ -1099,6 +1173,11 @@ class GenerationHandler:
         log_id = None  # Initialize log_id to avoid reference before assignment
         token_obj = None  # Initialize token_obj to avoid reference before assignment
 
+        # Non-streaming mode: only check availability
+        if not stream:
+            yield await self.handle_single(model, prompt, image, video, remix_target_id)
+            return
+
         # Validate model
         if model not in MODEL_CONFIG:
             raise ValueError(f"Invalid model: {model}")
@@ -1107,23 +1186,6 @@ class GenerationHandler:
         is_video = model_config["type"] == "video"
         is_image = model_config["type"] == "image"
 
-        # Non-streaming mode: only check availability
-        if not stream:
-            available = await self.check_token_availability(is_image, is_video)
-            if available:
-                if is_image:
-                    message = "All tokens available for image generation. Please enable streaming to use the generation feature."
-                else:
-                    message = "All tokens available for video generation. Please enable streaming to use the generation feature."
-            else:
-                if is_image:
-                    message = "No available models for image generation"
-                else:
-                    message = "No available models for video generation"
-
-            yield self._format_non_stream_response(message, is_availability_check=True)
-            return
-
         # Handle character creation and remix flows for video models
         if is_video:
             # Remix flow: remix_target_id provided
@@ -1135,7 +1197,7 @@ class GenerationHandler:
             # Character creation flow: video provided
             if video:
                 # Decode video if it's base64
-                video_data = self._decode_base64_video(video) if video.startswith("data:") or not video.startswith("http") else video
+                video_data = await self._decode_base64_video(video) if video.startswith("data:") or not video.startswith("http") else video
 
                 # If no prompt, just create character and return
                 if not prompt:
@@ -1274,7 +1336,7 @@ class GenerationHandler:
                         duration = time.time() - start_time
                         await self.db.update_request_log(
                             log_id,
-                            response_body=json.dumps({"error": str(e)}),
+                            response_body=orjson.dumps({"error": str(e)}).decode(),
                             status_code=500,
                             duration=duration
                         )
@@ -1289,7 +1351,7 @@ class GenerationHandler:
                 duration = time.time() - start_time
                 await self.db.update_request_log(
                     log_id,
-                    response_body=json.dumps({"error": str(last_error)}),
+                    response_body=orjson.dumps({"error": str(last_error)}).decode(),
                     status_code=500,
                     duration=duration
                 )
@@ -1305,7 +1367,7 @@ class GenerationHandler:
                                   token_obj = None,
                                   stream: bool = True,
                                   start_time: float = None,
-                                  log_id: Optional[int] = None) -> AsyncGenerator[str, None]:
+                                  log_id: Optional[int] = None) -> AsyncGenerator[bytes, None]:
         """Execute generation with the selected token
         
         Args:
@@ -1336,7 +1398,7 @@ class GenerationHandler:
                     )
                     is_first_chunk = False
 
-                image_data = self._decode_base64_image(image)
+                image_data = await self._decode_base64_image(image)
                 media_id = await self.sora_client.upload_image(image_data, token_obj.token)
 
                 if stream:
@@ -1482,17 +1544,13 @@ class GenerationHandler:
 
             # Add result_urls if available
             if task_info and task_info.result_urls:
-                try:
-                    result_urls = json.loads(task_info.result_urls)
-                    response_data["result_urls"] = result_urls
-                except:
-                    response_data["result_urls"] = task_info.result_urls
+                response_data["result_urls"] = task_info.result_urls
 
             # Update log entry with completion data
             if log_id:
                 await self.db.update_request_log(
                     log_id,
-                    response_body=json.dumps(response_data),
+                    response_body=orjson.dumps(response_data).decode(),
                     status_code=200,
                     duration=duration
                 )
@@ -1518,8 +1576,8 @@ class GenerationHandler:
             # Parse error message to check if it's a structured error (JSON)
             error_response = None
             try:
-                error_response = json.loads(str(e))
-            except:
+                error_response = orjson.loads(str(e))
+            except orjson.JSONDecodeError:
                 pass
 
             # Update log entry with error data
@@ -1532,7 +1590,7 @@ class GenerationHandler:
                     # Structured error (e.g., unsupported_country_code)
                     await self.db.update_request_log(
                         log_id,
-                        response_body=json.dumps(error_response),
+                        response_body=orjson.dumps(error_response).decode(),
                         status_code=400,
                         duration=duration
                     )
@@ -1540,14 +1598,14 @@ class GenerationHandler:
                     # Generic error
                     await self.db.update_request_log(
                         log_id,
-                        response_body=json.dumps({"error": str(e)}),
+                        response_body=orjson.dumps({"error": str(e)}).decode(),
                         status_code=500,
                         duration=duration
                     )
             raise e
     
     async def _poll_task_result(self, task_id: str, token: str, is_video: bool,
-                                stream: bool, prompt: str, token_id: int = None) -> AsyncGenerator[str, None]:
+                                stream: bool, prompt: str, token_id: int = None) -> AsyncGenerator[bytes, None]:
         """Poll for task result with timeout"""
         # Get timeout from config
         timeout = config.video_timeout if is_video else config.image_timeout
@@ -1595,7 +1653,7 @@ class GenerationHandler:
                 # Update request log
                 await self.db.update_request_log_by_task_id(
                     task_id,
-                    response_body=json.dumps({"error": f"Generation timeout after {elapsed_time:.1f} seconds", "status": "failed"}),
+                    response_body=orjson.dumps({"error": f"Generation timeout after {elapsed_time:.1f} seconds", "status": "failed"}).decode(),
                     status_code=408,
                     duration=elapsed_time
                 )
@@ -1680,7 +1738,7 @@ class GenerationHandler:
                                     debug_logger.log_error(
                                         error_message=error_message,
                                         status_code=400,
-                                        response_text=json.dumps(item)
+                                        response_text=orjson.dumps(item).decode()
                                     )
 
                                     # Update task status
@@ -1690,7 +1748,7 @@ class GenerationHandler:
                                     duration = time.time() - start_time
                                     await self.db.update_request_log_by_task_id(
                                         task_id,
-                                        response_body=json.dumps({"error": error_message, "status": "failed"}),
+                                        response_body=orjson.dumps({"error": error_message, "status": "failed"}).decode(),
                                         status_code=400,
                                         duration=duration
                                     )
@@ -1709,7 +1767,7 @@ class GenerationHandler:
                                             content=f"❌ 生成失败: {reason_str}",
                                             finish_reason="STOP"
                                         )
-                                        yield "data: [DONE]\n\n"
+                                        yield _SSE_DONE
 
                                     # Stop polling immediately
                                     return
@@ -1880,14 +1938,14 @@ class GenerationHandler:
                                 # Task completed
                                 await self.db.update_task(
                                     task_id, "completed", 100.0,
-                                    result_urls=json.dumps([local_url])
+                                    result_urls=[local_url]
                                 )
                                 
                                 # Update request log
                                 duration = time.time() - start_time
                                 await self.db.update_request_log_by_task_id(
                                     task_id,
-                                    response_body=json.dumps({"result_urls": [local_url], "status": "completed"}),
+                                    response_body=orjson.dumps({"result_urls": [local_url], "status": "completed"}).decode(),
                                     status_code=200,
                                     duration=duration
                                 )
@@ -1898,7 +1956,7 @@ class GenerationHandler:
                                         content=f"```html\n<video src='{local_url}' controls></video>\n```",
                                         finish_reason="STOP"
                                     )
-                                    yield "data: [DONE]\n\n"
+                                    yield _SSE_DONE
                                 return
                         
                         # If task not found in drafts either, it might still be processing
@@ -1969,14 +2027,14 @@ class GenerationHandler:
 
                                     await self.db.update_task(
                                         task_id, "completed", 100.0,
-                                        result_urls=json.dumps(local_urls)
+                                        result_urls=local_urls
                                     )
                                     
                                     # Update request log
                                     duration = time.time() - start_time
                                     await self.db.update_request_log_by_task_id(
                                         task_id,
-                                        response_body=json.dumps({"result_urls": local_urls, "status": "completed"}),
+                                        response_body=orjson.dumps({"result_urls": local_urls, "status": "completed"}).decode(),
                                         status_code=200,
                                         duration=duration
                                     )
@@ -1988,7 +2046,7 @@ class GenerationHandler:
                                             content=content_markdown,
                                             finish_reason="STOP"
                                         )
-                                        yield "data: [DONE]\n\n"
+                                        yield _SSE_DONE
                                     return
 
                             elif status == "failed":
@@ -1999,7 +2057,7 @@ class GenerationHandler:
                                 duration = time.time() - start_time
                                 await self.db.update_request_log_by_task_id(
                                     task_id,
-                                    response_body=json.dumps({"error": error_msg, "status": "failed"}),
+                                    response_body=orjson.dumps({"error": error_msg, "status": "failed"}).decode(),
                                     status_code=500,
                                     duration=duration
                                 )
@@ -2073,8 +2131,8 @@ class GenerationHandler:
         raise Exception(f"Upstream API timeout: Generation exceeded {timeout} seconds limit")
     
     def _format_stream_chunk(self, content: str = None, reasoning_content: str = None,
-                            finish_reason: str = None, is_first: bool = False) -> str:
-        """Format streaming response chunk
+                            finish_reason: str = None, is_first: bool = False) -> bytes:
+        """Format streaming response chunk as an SSE frame, encoded once here
 
         Args:
             content: Final response content (for user-facing output)
@@ -2082,7 +2140,9 @@ class GenerationHandler:
             finish_reason: Finish reason (e.g., "STOP")
             is_first: Whether this is the first chunk (includes role)
         """
-        chunk_id = f"chatcmpl-{int(datetime.now().timestamp() * 1000)}"
+        # 同一个时间戳同时用于 id 和 created，每个 chunk 只读一次时钟
+        now = time.time()
+        chunk_id = f"chatcmpl-{int(now * 1000)}"
 
         delta = {}
 
@@ -2106,7 +2166,7 @@ class GenerationHandler:
         response = {
             "id": chunk_id,
             "object": "chat.completion.chunk",
-            "created": int(datetime.now().timestamp()),
+            "created": int(now),
             "model": "sora",
             "choices": [{
                 "index": 0,
@@ -2124,7 +2184,7 @@ class GenerationHandler:
             response["usage"]["completion_tokens"] = 1
             response["usage"]["total_tokens"] = 1
 
-        return f'data: {json.dumps(response)}\n\n'
+        return b'data: ' + orjson.dumps(response) + b'\n\n'
     
     def _format_non_stream_response(self, content: str, media_type: str = None, is_availability_check: bool = False) -> str:
         """Format non-streaming response
@@ -2141,10 +2201,11 @@ class GenerationHandler:
             else:
                 content = f"![Generated Image]({content})"
 
+        now = time.time()
         response = {
-            "id": f"chatcmpl-{datetime.now().timestamp()}",
+            "id": f"chatcmpl-{now}",
             "object": "chat.completion",
-            "created": int(datetime.now().timestamp()),
+            "created": int(now),
             "model": "sora",
             "choices": [{
                 "index": 0,
@@ -2155,7 +2216,7 @@ class GenerationHandler:
                 "finish_reason": "stop"
             }]
         }
-        return json.dumps(response)
+        return orjson.dumps(response).decode()
 
     async def _log_request(self, token_id: Optional[int], operation: str,
                           request_data: Dict[str, Any], response_data: Dict[str, Any],
@@ -2166,8 +2227,8 @@ class GenerationHandler:
                 token_id=token_id,
                 task_id=task_id,
                 operation=operation,
-                request_body=json.dumps(request_data),
-                response_body=json.dumps(response_data),
+                request_body=orjson.dumps(request_data).decode(),
+                response_body=orjson.dumps(response_data).decode(),
                 status_code=status_code,
                 duration=duration
             )
@@ -2179,7 +2240,7 @@ class GenerationHandler:
 
     # ==================== Character Creation and Remix Handlers ====================
 
-    async def _handle_character_creation_only(self, video_data, model_config: Dict, timestamps: str = "0,3") -> AsyncGenerator[str, None]:
+    async def _handle_character_creation_only(self, video_data, model_config: Dict, timestamps: str = "0,3") -> AsyncGenerator[bytes, None]:
         """Handle character creation only (no video generation)
 
         Flow:
@@ -2311,7 +2372,7 @@ class GenerationHandler:
                 content=f"角色创建成功，角色名@{username}",
                 finish_reason="STOP"
             )
-            yield "data: [DONE]\n\n"
+            yield _SSE_DONE
 
         except Exception as e:
             # Log failed character creation
@@ -2338,7 +2399,7 @@ class GenerationHandler:
             )
             raise
 
-    async def _handle_character_and_video_generation(self, video_data, prompt: str, model_config: Dict, timestamps: str = "0,3") -> AsyncGenerator[str, None]:
+    async def _handle_character_and_video_generation(self, video_data, prompt: str, model_config: Dict, timestamps: str = "0,3") -> AsyncGenerator[bytes, None]:
         """Handle character creation and video generation
 
         Flow:
@@ -2563,7 +2624,7 @@ class GenerationHandler:
                         response_text=str(e)
                     )
 
-    async def _handle_remix(self, remix_target_id: str, prompt: str, model_config: Dict) -> AsyncGenerator[str, None]:
+    async def _handle_remix(self, remix_target_id: str, prompt: str, model_config: Dict) -> AsyncGenerator[bytes, None]:
         """Handle remix video generation
 
         Flow:
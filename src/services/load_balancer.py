@@ -1,6 +1,7 @@
 """Load balancing module"""
 import random
 import time
+from datetime import datetime
 from typing import Optional, List
 from ..core.models import Token
 from ..core.config import config
@@ -44,20 +45,24 @@ class LoadBalancer:
             if current_time - self._last_auto_refresh_check_time >= self._auto_refresh_check_interval:
                 self._last_auto_refresh_check_time = current_time
                 debug_logger.log_info(f"[LOAD_BALANCER] 🔄 自动刷新功能已启用，开始检查Token过期时间...")
-                all_tokens = await self.token_manager.get_all_tokens()
-                debug_logger.log_info(f"[LOAD_BALANCER] 📊 总Token数: {len(all_tokens)}")
-
-                refresh_count = 0
-                for token in all_tokens:
+                # 用游标流式扫描全部 Token，只收集需要刷新的 ID；刷新在游标关闭后进行，避免网络请求期间占用连接
+                total_count = 0
+                expiring_ids = []
+                now = datetime.now()
+                async for token in self.token_manager.db.iter_all_tokens():
+                    total_count += 1
                     if token.is_active and token.expiry_time:
-                        from datetime import datetime
-                        time_until_expiry = token.expiry_time - datetime.now()
+                        time_until_expiry = token.expiry_time - now
                         hours_until_expiry = time_until_expiry.total_seconds() / 3600
                         # Refresh if expiry is within 24 hours
                         if hours_until_expiry <= 24:
                             debug_logger.log_info(f"[LOAD_BALANCER] 🔔 Token {token.id} ({token.email}) 需要刷新，剩余时间: {hours_until_expiry:.2f} 小时")
-                            refresh_count += 1
-                            await self.token_manager.auto_refresh_expiring_token(token.id)
+                            expiring_ids.append(token.id)
+                debug_logger.log_info(f"[LOAD_BALANCER] 📊 总Token数: {total_count}")
+
+                refresh_count = len(expiring_ids)
+                for token_id in expiring_ids:
+                    await self.token_manager.auto_refresh_expiring_token(token_id)
 
                 if refresh_count == 0:
                     debug_logger.log_info(f"[LOAD_BALANCER] ✅ 所有Token都无需刷新")
@@ -78,7 +83,21 @@ class LoadBalancer:
 
         # If for video generation, filter out tokens with Sora2 quota exhausted and tokens without Sora2 support
         if for_video_generation:
-            from datetime import datetime
+            # 一次选择内共用同一个当前时间，避免每个 token 都构造 datetime
+            now = datetime.now()
+
+            # Refresh tokens whose Sora2 cooldown has expired, then reload them in one query
+            expired_ids = [
+                token.id for token in active_tokens
+                if token.video_enabled and token.sora2_supported
+                and token.sora2_cooldown_until and token.sora2_cooldown_until <= now
+            ]
+            reloaded = {}
+            if expired_ids:
+                for token_id in expired_ids:
+                    await self.token_manager.refresh_sora2_remaining_if_cooldown_expired(token_id)
+                reloaded = {token.id: token for token in await self.token_manager.db.get_tokens_by_ids(expired_ids)}
+
             available_tokens = []
             for token in active_tokens:
                 # Skip tokens that don't have video enabled
@@ -89,14 +108,12 @@ class LoadBalancer:
                 if not token.sora2_supported:
                     continue
 
-                # Check if Sora2 cooldown has expired and refresh if needed
-                if token.sora2_cooldown_until and token.sora2_cooldown_until <= datetime.now():
-                    await self.token_manager.refresh_sora2_remaining_if_cooldown_expired(token.id)
-                    # Reload token data after refresh
-                    token = await self.token_manager.db.get_token(token.id)
+                # Use reloaded token data after refresh (None if it was deleted meanwhile)
+                if token.sora2_cooldown_until and token.sora2_cooldown_until <= now:
+                    token = reloaded.get(token.id)
 
                 # Skip tokens that are in Sora2 cooldown (quota exhausted)
-                if token and token.sora2_cooldown_until and token.sora2_cooldown_until > datetime.now():
+                if token and token.sora2_cooldown_until and token.sora2_cooldown_until > now:
                     continue
 
                 if token:
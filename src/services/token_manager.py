@@ -857,11 +857,8 @@ class TokenManager:
             video_concurrency=video_concurrency
         )
 
-        # Save to database
-        token_id = await self.db.add_token(token)
-        token.id = token_id
-
-        return token
+        # Save to database (returns the stored row, including id and defaults)
+        return await self.db.add_token(token)
 
     async def update_existing_token(self, token_id: int, token_value: str,
                                     st: Optional[str] = None,
@@ -0,0 +1,103 @@
+"""Tests for Database.create_task batching (create_task / _flush_pending_tasks)"""
+import asyncio
+
+import pytest
+
+from src.core.database import Database
+from src.core.models import Task
+
+
+class FakePool:
+    """Minimal stand-in for asyncpg.Pool covering the task insert paths"""
+
+    def __init__(self, fail_batch: bool = False, bad_task_ids=()):
+        self.fail_batch = fail_batch
+        self.bad_task_ids = set(bad_task_ids)
+        self.batches = []
+        self.single_inserts = []
+        self.closed = False
+        self._next_id = 1
+
+    def _take_id(self) -> int:
+        row_id, self._next_id = self._next_id, self._next_id + 1
+        return row_id
+
+    async def fetch(self, sql, task_ids, *columns):
+        await asyncio.sleep(0)
+        assert not self.closed, "batch insert ran after the pool was closed"
+        if self.fail_batch:
+            raise RuntimeError("batch insert failed")
+        self.batches.append(list(task_ids))
+        return [{"id": self._take_id(), "task_id": task_id} for task_id in task_ids]
+
+    async def fetchval(self, sql, task_id, *values):
+        await asyncio.sleep(0)
+        assert not self.closed, "single insert ran after the pool was closed"
+        if task_id in self.bad_task_ids:
+            raise ValueError(f"bad task {task_id}")
+        self.single_inserts.append(task_id)
+        return self._take_id()
+
+    async def close(self):
+        self.closed = True
+
+
+def _database(pool: FakePool) -> Database:
+    db = Database("postgresql://test@localhost/test")
+    db.pool = pool
+    return db
+
+
+def _task(task_id: str) -> Task:
+    return Task(task_id=task_id, token_id=1, model="sora2-landscape-10s", prompt="test")
+
+
+def test_cancelled_caller_does_not_block_the_batch():
+    async def scenario():
+        pool = FakePool()
+        db = _database(pool)
+        cancelled = asyncio.create_task(db.create_task(_task("a")))
+        waiting = asyncio.create_task(db.create_task(_task("b")))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+
+        row_id = await asyncio.wait_for(waiting, 1)
+        assert isinstance(row_id, int)
+        assert cancelled.cancelled()
+        assert db._task_flush is None
+
+    asyncio.run(scenario())
+
+
+def test_batch_failure_falls_back_to_single_inserts():
+    async def scenario():
+        pool = FakePool(fail_batch=True, bad_task_ids={"bad"})
+        db = _database(pool)
+        good = asyncio.create_task(db.create_task(_task("good")))
+        bad = asyncio.create_task(db.create_task(_task("bad")))
+
+        assert isinstance(await asyncio.wait_for(good, 1), int)
+        with pytest.raises(ValueError):
+            await asyncio.wait_for(bad, 1)
+        assert pool.single_inserts == ["good"]
+
+    asyncio.run(scenario())
+
+
+def test_close_during_batch_window_writes_queued_tasks():
+    async def scenario():
+        pool = FakePool()
+        db = _database(pool)
+        # Keep the window open so close() arrives while the batch is still queued
+        db._TASK_BATCH_WINDOW = 10
+        pending = asyncio.create_task(db.create_task(_task("a")))
+        await asyncio.sleep(0)
+        assert db._task_flush is not None
+
+        await asyncio.wait_for(db.close(), 1)
+
+        assert isinstance(pending.result(), int)
+        assert pool.batches == [["a"]]
+        assert pool.closed
+
+    asyncio.run(scenario())